@@ -1,6 +1,7 @@
 import importlib
 import json
 import logging
+import multiprocessing
 import os
 from datetime import timedelta
 from typing import Optional, Dict, Any
@@ -207,7 +208,10 @@ def _should_run_startup() -> bool:
     """
     디버그 리로더(werkzeug)가 부모/자식 프로세스를 두 번 띄우는 것을 감지해
     실제 서비스 프로세스에서만 초기화가 실행되도록 한다.
+    spawn 방식 워커 프로세스(카탈로그 명사 추출 등)가 이 모듈을 다시 import할 때도 건너뛴다.
     """
+    if multiprocessing.parent_process() is not None:
+        return False
     run_main = os.environ.get("WERKZEUG_RUN_MAIN")
     # debug=False인 경우 run_main은 None → 실행, debug=True인 경우 자식 프로세스에서 "true"
     return run_main in (None, "true")
@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterable, List, Union
+from typing import Dict, List, Optional, Union
 
 import pandas as pd
 
+try:  # 설치되어 있으면 더 빠른 JSON 디코더를 사용한다.
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency guard
+    orjson = None
+
 # quick_text_probe_parallel 디렉터리의 JSONL 파일을 기본 소스로 사용한다.
 # env(RECOMMENDER_DATA_DIR) > back/recommender/data/... > back/crawd/workflowP/craw/data/...
 _ENV_DATA_DIR = os.getenv("RECOMMENDER_DATA_DIR")
@@ -25,10 +33,42 @@ DATA_DIR = (
     else _CRAWD_DATA_DIR
 )
 
+# 병렬 파싱 워커 수(0=자동). 자동 모드는 파트 총 용량이 임계값을 넘을 때만 프로세스 풀을 쓴다.
+INGEST_WORKERS = int(os.getenv("RECOMMENDER_INGEST_WORKERS", "0"))
+_PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+_NON_DIGIT = re.compile(r"[^\d]")
+_TAG_SPLIT = re.compile(r"[\\n/]+")
+
+CATALOG_COLUMNS = [
+    "product_id",
+    "title",
+    "price",
+    "rating",
+    "popularity",
+    "tags",
+    "category_path",
+    "image",
+    "link",
+    "source",
+]
+
+
+def _loads(line: bytes):
+    """orjson이 있으면 우선 사용하고, 표준 json만 허용하는 입력(NaN 등)은 json으로 재시도한다."""
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except ValueError:
+            pass
+    return json.loads(line)
+
 
 def _parse_price(value) -> int:
     """숫자·쉼표 외 문자를 제거해 정수 가격으로 변환한다."""
-    digits = re.sub(r"[^\d]", "", str(value) if value is not None else "")
+    if type(value) is int and value >= 0:
+        return value
+    digits = _NON_DIGIT.sub("", str(value) if value is not None else "")
     return int(digits) if digits else 0
 
 
@@ -58,63 +98,142 @@ def _split_tags(raw: str) -> List[str]:
     """제품 태그 문자열을 개략적인 토큰 리스트로 분리한다."""
     if not raw:
         return []
-    return [part.strip() for part in re.split(r"[\\n/]+", str(raw)) if part.strip()]
+    return [part.strip() for part in _TAG_SPLIT.split(str(raw)) if part.strip()]
 
 
-def _iter_products(target_dir: Path) -> Iterable[Dict]:
-    """모든 JSONL 파트를 스트리밍하며 상품 행 딕셔너리를 생성한다."""
-    parts = sorted(target_dir.glob("part_*.jsonl"))
+def list_part_files(target_dir: Path) -> List[Path]:
+    """카탈로그를 구성하는 part_*.jsonl 파일을 정렬된 순서로 반환한다."""
+    parts = sorted(Path(target_dir).glob("part_*.jsonl"))
     if not parts:
         raise FileNotFoundError(f"JSONL 파트 파일을 찾을 수 없습니다: {target_dir}")
-    pid = 1
-    for part_path in parts:
-        with part_path.open(encoding="utf-8") as fp:
-            for line in fp:
-                if not line.strip():
-                    continue
-                payload = json.loads(line)
-                if not payload.get("ok", True):
-                    continue
-                categories = [p for p in payload.get("path", []) if p]
-                link = payload.get("link", "")
-                for prod in payload.get("products", []):
-                    yield {
-                        "product_id": pid,
-                        "title": prod.get("prod_name", "").strip(),
-                        "price": _parse_price(prod.get("price")),
-                        "rating": _parse_rating(prod),
-                        "popularity": _parse_popularity(prod),
-                        "tags": _split_tags(prod.get("tags", "")),
-                        "category_path": categories,
-                        "image": prod.get("image", ""),
-                        "link": link,
-                    }
-                    pid += 1
-
-
-def sample_data(path: Union[str, Path, None] = None) -> pd.DataFrame:
+    return parts
+
+
+def make_product_id(source: str, link: str, title: str) -> str:
     """
-    quick_text_probe_parallel 데이터에서 상품 목록을 구성해 반환한다.
+    파트 파일명·상품 페이지 링크·상품명으로 안정적인 product_id(16자리 hex)를 만든다.
 
-    - 기본 경로는 ./data/quick_text_probe_parallel 이며, part_*.jsonl을 전부 읽는다.
-    - JSON 파일 경로가 들어오면 기존 방식처럼 단일 파일을 읽는 폴백을 유지한다.
+    파트 추가/순서 변경과 무관하게 같은 상품은 항상 같은 id를 갖는다.
+    """
+    key = "\x1f".join((source, link or "", title or ""))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _parse_part(part_path: Path) -> Dict[str, list]:
+    """JSONL 파트 하나를 읽어 행 딕셔너리 없이 컬럼별 리스트로 바로 채운다."""
+    columns: Dict[str, list] = {name: [] for name in CATALOG_COLUMNS if name != "source"}
+    product_id, title = columns["product_id"], columns["title"]
+    price, rating = columns["price"], columns["rating"]
+    popularity, tags, category_path = columns["popularity"], columns["tags"], columns["category_path"]
+    image, link_col = columns["image"], columns["link"]
+    source = Path(part_path).name
+    with Path(part_path).open("rb") as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            payload = _loads(line)
+            if not payload.get("ok", True):
+                continue
+            categories = [p for p in payload.get("path", []) if p]
+            link = payload.get("link", "")
+            for prod in payload.get("products", []):
+                name = prod.get("prod_name", "").strip()
+                product_id.append(make_product_id(source, link, name))
+                title.append(name)
+                price.append(_parse_price(prod.get("price")))
+                rating.append(_parse_rating(prod))
+                popularity.append(_parse_popularity(prod))
+                tags.append(_split_tags(prod.get("tags", "")))
+                category_path.append(categories)
+                image.append(prod.get("image", ""))
+                link_col.append(link)
+    columns["source"] = [source] * len(title)
+    return columns
+
+
+def _resolve_workers(parts: List[Path], workers: Optional[int]) -> int:
+    """명시값 → 환경변수 → 자동(용량 기준) 순으로 파싱 워커 수를 정한다."""
+    requested = INGEST_WORKERS if workers is None else workers
+    if requested > 0:
+        return min(requested, len(parts))
+    total_bytes = sum(p.stat().st_size for p in parts)
+    if total_bytes < _PARALLEL_MIN_BYTES:
+        return 1
+    return max(1, min(os.cpu_count() or 1, len(parts)))
+
+
+def _read_catalog_columns(parts: List[Path], workers: Optional[int] = None) -> Dict[str, list]:
+    """
+    주어진 JSONL 파트를 컬럼 단위로 읽어 합친다.
+
+    워커가 2개 이상이면 프로세스 풀에서 파트별로 파싱하고, 결과는 항상 파트 정렬 순서로
+    이어 붙이므로 행 순서는 단일 스레드 경로와 동일하게 결정적이다.
+    서버에서는 워밍업·감시 스레드가 돌고 Okt JVM이 떠 있을 수 있어 fork 대신 spawn으로 워커를 띄운다.
+    """
+    n_workers = _resolve_workers(parts, workers)
+    if n_workers > 1:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx) as pool:
+            chunks = list(pool.map(_parse_part, parts))
+    else:
+        chunks = [_parse_part(part) for part in parts]
+    merged: Dict[str, list] = {name: [] for name in CATALOG_COLUMNS}
+    for chunk in chunks:
+        for name, values in chunk.items():
+            merged[name].extend(values)
+    return merged
+
+
+def _frame_from_columns(columns: Dict[str, list]) -> pd.DataFrame:
+    df = pd.DataFrame(columns, columns=CATALOG_COLUMNS)
+    # 텍스트 전처리 단계에서 기대하는 컬럼 형태를 맞춘다.
+    df["price"] = df["price"].fillna(0).astype(int)
+    df["rating"] = df["rating"].fillna(0.0).astype(float)
+    df["popularity"] = df["popularity"].fillna(0).astype(int)
+    return df
+
+
+def load_parts(parts: List[Path], workers: Optional[int] = None) -> pd.DataFrame:
+    """지정한 파트 파일만 읽어 상품 데이터프레임을 만든다(증분 반영용, 상품이 없으면 빈 프레임)."""
+    return _frame_from_columns(_read_catalog_columns(sorted(parts), workers))
+
+
+def legacy_id_mapping(path: Union[str, Path, None] = None) -> Dict[int, str]:
     """
+    예전 순번 product_id(파트 정렬 순서대로 1부터 증가) → 현재 안정 id 매핑을 만든다.
+
+    순번 id가 발급될 당시와 같은 파트 구성을 기준으로 실행해야 매핑이 정확하다.
+    """
+    target = resolve_data_path(path)
+    columns = _read_catalog_columns(list_part_files(target))
+    return {seq: pid for seq, pid in enumerate(columns["product_id"], start=1)}
+
+
+def resolve_data_path(path: Union[str, Path, None] = None) -> Path:
+    """명시 경로 → DATA_DIR → 기본 폴백 순서로 실제 카탈로그 소스 경로를 고른다."""
     target = Path(path) if path else DATA_DIR
     if not target.exists():
         for fallback in (_DEFAULT_DATA_DIR, _CRAWD_DATA_DIR):
             if fallback.exists():
                 target = fallback
                 break
+    return target
+
+
+def sample_data(path: Union[str, Path, None] = None, workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    quick_text_probe_parallel 데이터에서 상품 목록을 구성해 반환한다.
+
+    - 기본 경로는 ./data/quick_text_probe_parallel 이며, part_*.jsonl을 전부 읽는다.
+    - JSON 파일 경로가 들어오면 기존 방식처럼 단일 파일을 읽는 폴백을 유지한다.
+    - workers: 파트 병렬 파싱 프로세스 수(None이면 RECOMMENDER_INGEST_WORKERS/자동).
+    """
+    target = resolve_data_path(path)
     if target.is_file():
         return pd.read_json(target)
     if not target.exists():
         raise FileNotFoundError(f"샘플 카탈로그 소스를 찾을 수 없습니다: {target}")
-    rows = list(_iter_products(target))
-    if not rows:
+    columns = _read_catalog_columns(list_part_files(target), workers)
+    if not columns["product_id"]:
         raise ValueError("읽어들인 상품이 없습니다. 데이터 파일을 확인하세요.")
-    df = pd.DataFrame(rows)
-    # 텍스트 전처리 단계에서 기대하는 컬럼 형태를 맞춘다.
-    df["price"] = df["price"].fillna(0).astype(int)
-    df["rating"] = df["rating"].fillna(0.0).astype(float)
-    df["popularity"] = df["popularity"].fillna(0).astype(int)
-    return df
+    return _frame_from_columns(columns)
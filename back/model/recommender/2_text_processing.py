@@ -2,10 +2,19 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import multiprocessing
+import os
 import re
 import unicodedata
-from typing import List, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import importlib
 
@@ -18,9 +27,32 @@ try:
 except Exception:  # pragma: no cover - optional dependency guard
     Okt = None
 
-_OKT = Okt() if Okt is not None else None
+# Okt는 JVM을 띄우므로 import 시점이 아니라 첫 사용(또는 warm_okt_async) 때 만든다.
+_OKT = None
+_OKT_FAILED = False
+_OKT_INIT_LOCK = Lock()
+# JPype/Okt 호출은 스레드 안전을 보장하지 않아 Flask 워커 스레드 간에 직렬화한다.
+_OKT_CALL_LOCK = Lock()
+NOUN_CACHE_SIZE = int(os.getenv("RECO_NOUN_CACHE_SIZE", "4096"))
+# 카탈로그 명사 추출 병렬 설정: 워커 수(0=CPU 수), 워커당 작업 단위(문서 수), 디스크 캐시 위치
+NOUN_WORKERS = int(os.getenv("RECO_NOUN_WORKERS", "0"))
+NOUN_CHUNK_SIZE = int(os.getenv("RECO_NOUN_CHUNK_SIZE", "2000"))
+_ENV_NOUN_CACHE_DIR = os.getenv("RECO_NOUN_CACHE_DIR")
+NOUN_CACHE_DIR = (
+    Path(_ENV_NOUN_CACHE_DIR)
+    if _ENV_NOUN_CACHE_DIR
+    else Path(__file__).resolve().parents[1] / "artifacts" / "noun_cache"
+)
+_NOUN_CACHE_FILE = "okt_nouns.jsonl"
 
 _KOREAN_ONLY = re.compile(r"^[가-힣]+$")
+_NON_WORD = re.compile(r"[^0-9a-zA-Z가-힣\s]")
+_WHITESPACE = re.compile(r"\s+")
+_HAS_DIGIT = re.compile(r"\d")
+# 일괄 정규화에서 문서 경계로 쓰는 구분자와, 구분자를 제외한 공백 패턴
+_DOC_SEP = "\n"
+_INLINE_WHITESPACE = re.compile(r"[^\S\n]+")
+_SEP_PADDING = re.compile(r" ?\n ?")
 _KOREAN_PARTICLE_SUFFIXES = [
     # 긴 것부터 매칭
     "에게서", "에게만", "에게로", "에서만", "으로부터", "으로서", "으로써",
@@ -44,52 +76,303 @@ _KOREAN_VERB_SUFFIXES = [
 ]
 
 
+class SuffixTrie:
+    """
+    접미사를 뒤집어 넣은 트라이. 토큰 끝에서부터 한 번만 거슬러 올라가며
+    토큰보다 짧은 최장 일치 접미사를 찾는다.
+    """
+
+    _END = ""  # 한 글자짜리 키와 겹치지 않는 종료 표시
+
+    def __init__(self, suffixes: Sequence[str]):
+        self._root: Dict[str, dict] = {}
+        for suffix in suffixes:
+            node = self._root
+            for ch in reversed(suffix):
+                node = node.setdefault(ch, {})
+            node[self._END] = {}
+
+    def longest_match(self, token: str) -> int:
+        """len(token)보다 짧은 최장 일치 접미사의 길이를 반환한다(없으면 0)."""
+        node = self._root
+        best = 0
+        for depth in range(1, len(token)):
+            node = node.get(token[-depth])
+            if node is None:
+                break
+            if self._END in node:
+                best = depth
+        return best
+
+
+# 두 목록 모두 "긴 것부터" 순서이므로(짧은 접미사가 자신을 포함하는 긴 접미사보다 앞서는 경우 없음)
+# 최장 일치는 기존 선형 탐색의 첫 일치와 같다. tools/check_suffix_trie.py로 검증한다.
+_PARTICLE_TRIE = SuffixTrie(_KOREAN_PARTICLE_SUFFIXES)
+_VERB_TRIE = SuffixTrie(_KOREAN_VERB_SUFFIXES)
+
+
 def _strip_korean_suffix(token: str) -> str:
-    """조사/어미를 단순 제거해 어간만 남긴다."""
+    """조사 → 어미 순으로 최장 접미사를 한 번씩 제거해 어간만 남긴다."""
     if not _KOREAN_ONLY.match(token):
         return token
-    base = token
-    for suffix in _KOREAN_PARTICLE_SUFFIXES:
-        if base.endswith(suffix) and len(base) > len(suffix):
-            base = base[: -len(suffix)]
-            break
-    for suffix in _KOREAN_VERB_SUFFIXES:
-        if base.endswith(suffix) and len(base) > len(suffix):
-            base = base[: -len(suffix)]
-            break
-    return base
-
-
-def _extract_nouns_ko(text: str) -> List[str]:
-    """Okt 명사 추출 기반 한국어 형태소 분리(실패 시 빈 리스트)."""
-    if _OKT is None:
-        return []
-    try:
-        nouns = _OKT.nouns(text)
-    except Exception:
-        return []
+    cut = _PARTICLE_TRIE.longest_match(token)
+    base = token[:-cut] if cut else token
+    cut = _VERB_TRIE.longest_match(base)
+    return base[:-cut] if cut else base
+
+
+def _get_okt():
+    """Okt 인스턴스를 지연 생성한다. 다른 스레드가 초기화 중이면 끝날 때까지 기다린다."""
+    global _OKT, _OKT_FAILED
+    if _OKT is not None or _OKT_FAILED or Okt is None:
+        return _OKT
+    with _OKT_INIT_LOCK:
+        if _OKT is None and not _OKT_FAILED:
+            try:
+                _OKT = Okt()
+            except Exception:  # pragma: no cover - JVM 미설치 등 환경 문제
+                _OKT_FAILED = True
+    return _OKT
+
+
+def warm_okt_async() -> None:
+    """서버 기동 시 백그라운드 스레드에서 Okt(JVM)를 미리 초기화한다."""
+    if Okt is None or _OKT is not None or _OKT_FAILED:
+        return
+    Thread(target=_get_okt, daemon=True).start()
+
+
+def _clean_nouns(nouns: Sequence[str]) -> List[str]:
     cleaned = []
     for noun in nouns:
         n = nfkc_lower(noun)
         if not n or n in STOPWORDS:
             continue
-        if re.search(r"\d", n):
+        if _HAS_DIGIT.search(n):
             continue
         cleaned.append(n)
     return cleaned
 
 
+def _okt_nouns(text: str) -> List[str]:
+    """Okt 명사 추출 결과를 정리해 반환한다. 추출기 오류는 그대로 올린다."""
+    okt = _get_okt()
+    if okt is None:
+        return []
+    with _OKT_CALL_LOCK:
+        nouns = okt.nouns(text)
+    return _clean_nouns(nouns)
+
+
+def nouns_available() -> bool:
+    """konlpy(Okt)를 쓸 수 있는 환경인지 여부(JVM 초기화 실패가 확인되면 False)."""
+    return Okt is not None and not _OKT_FAILED
+
+
+@lru_cache(maxsize=NOUN_CACHE_SIZE)
+def _cached_nouns(text: str) -> Tuple[str, ...]:
+    # 예외는 캐시되지 않으므로 일시적 실패가 고정되지 않는다.
+    return tuple(_okt_nouns(text))
+
+
+def _extract_nouns_ko(text: str, *, cached: bool = True) -> List[str]:
+    """
+    Okt 명사 추출 기반 한국어 형태소 분리(실패 시 빈 리스트).
+
+    질의 경로는 정규화된 텍스트를 키로 LRU 캐시를 거친다. 카탈로그 일괄 처리는
+    extract_nouns_batch를 쓰며, 단건 호출 시 LRU 캐시를 피하려면 cached=False를 준다.
+    """
+    if Okt is None or _OKT_FAILED:
+        return []
+    try:
+        return list(_cached_nouns(text)) if cached else _okt_nouns(text)
+    except Exception:
+        return []
+
+
+def _text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_noun_cache(path: Path) -> Dict[str, List[str]]:
+    """텍스트 해시 → Okt 원본 명사 목록 캐시를 읽는다. 깨진 줄(중단된 기록)은 건너뛴다."""
+    cache: Dict[str, List[str]] = {}
+    if not path.exists():
+        return cache
+    with path.open("r", encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                entry = json.loads(line)
+                cache[entry["h"]] = entry["n"]
+            except (ValueError, KeyError, TypeError):
+                continue
+    return cache
+
+
+def _append_noun_cache(path: Path, entries: Dict[str, List[str]]):
+    if not entries:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as fp:
+        for key, nouns in entries.items():
+            fp.write(json.dumps({"h": key, "n": nouns}, ensure_ascii=False) + "\n")
+
+
+def _init_noun_worker():
+    """워커 프로세스마다 Okt(JVM)를 한 번 띄워 둔다."""
+    _get_okt()
+
+
+def _raw_nouns_chunk(texts: Sequence[str]) -> List[List[str]]:
+    """
+    문서 묶음의 Okt 원본 명사 목록을 반환한다(정리 전, 실패한 문서는 빈 목록).
+
+    불용어 정리는 읽는 쪽에서 하므로 불용어 목록이 바뀌어도 캐시는 유효하다.
+    """
+    okt = _get_okt()
+    results: List[List[str]] = []
+    for text in texts:
+        try:
+            if okt is None:
+                results.append([])
+                continue
+            with _OKT_CALL_LOCK:
+                results.append(list(okt.nouns(text)))
+        except Exception:
+            results.append([])
+    return results
+
+
+def _resolve_noun_workers(workers: Optional[int], n_chunks: int) -> int:
+    requested = NOUN_WORKERS if workers is None else workers
+    if requested <= 0:
+        requested = os.cpu_count() or 1
+    return max(1, min(requested, n_chunks))
+
+
+def extract_nouns_batch(
+    texts: Sequence[str],
+    *,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    cache_dir: Union[str, Path, None] = None,
+    progress: bool = True,
+) -> List[List[str]]:
+    """
+    정규화된 문서들의 명사를 한 번에 추출한다. 각 원소는 _extract_nouns_ko(text)와 같다.
+
+    - 같은 텍스트는 한 번만 추출하고, 결과는 텍스트 해시를 키로 디스크 캐시에 누적한다.
+    - 캐시에 없는 문서는 chunk_size 단위로 나눠 워커 프로세스(각자 Okt/JVM 보유)에 분배한다.
+    - JVM이 뜬 프로세스를 fork하면 안전하지 않으므로 워커는 spawn 방식으로 띄운다.
+    """
+    if not nouns_available():
+        return [[] for _ in texts]
+    cache_path = Path(cache_dir or NOUN_CACHE_DIR) / _NOUN_CACHE_FILE
+    cache = _load_noun_cache(cache_path)
+    keys = [_text_key(text) for text in texts]
+    pending: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cache and key not in pending:
+            pending[key] = text
+
+    if pending:
+        size = max(1, chunk_size or NOUN_CHUNK_SIZE)
+        items = list(pending.items())
+        chunks = [items[i : i + size] for i in range(0, len(items), size)]
+        n_workers = _resolve_noun_workers(workers, len(chunks))
+        if progress:
+            print(
+                f"[progress] 명사 추출: 고유 문서 {len(set(keys))}건 중 캐시 적중 "
+                f"{len(set(keys)) - len(pending)}건, 신규 {len(pending)}건을 {n_workers}개 프로세스로 처리"
+            )
+        fresh: Dict[str, List[str]] = {}
+        done = 0
+
+        def _collect(chunk, nouns_list):
+            nonlocal done
+            for (key, _), nouns in zip(chunk, nouns_list):
+                fresh[key] = nouns
+            done += len(chunk)
+            if progress:
+                print(f"[progress] 명사 추출 {done}/{len(items)} ({done * 100 // len(items)}%)")
+
+        try:
+            if n_workers == 1:
+                for chunk in chunks:
+                    _collect(chunk, _raw_nouns_chunk([text for _, text in chunk]))
+            else:
+                ctx = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(
+                    max_workers=n_workers, mp_context=ctx, initializer=_init_noun_worker
+                ) as pool:
+                    futures = {
+                        pool.submit(_raw_nouns_chunk, [text for _, text in chunk]): chunk for chunk in chunks
+                    }
+                    for future in as_completed(futures):
+                        _collect(futures[future], future.result())
+        finally:
+            # 중간에 실패해도 끝난 묶음까지는 캐시에 남겨 다음 실행이 이어서 처리한다.
+            try:
+                _append_noun_cache(cache_path, fresh)
+            except OSError:
+                pass
+        cache.update(fresh)
+
+    cleaned: Dict[str, List[str]] = {}
+    results: List[List[str]] = []
+    for key in keys:
+        if key not in cleaned:
+            cleaned[key] = _clean_nouns(cache[key])
+        results.append(list(cleaned[key]))
+    return results
+
+
 def normalize_text(text: str) -> str:
     """NFKC 정규화와 소문자화, 간단한 공백/기호 정리를 수행한다."""
     if text is None:
         return ""
     norm = unicodedata.normalize("NFKC", str(text))
     norm = norm.lower()
-    norm = re.sub(r"[^0-9a-zA-Z가-힣\s]", " ", norm)
-    norm = re.sub(r"\s+", " ", norm).strip()
+    norm = _NON_WORD.sub(" ", norm)
+    norm = _WHITESPACE.sub(" ", norm).strip()
     return norm
 
 
+def normalize_texts(texts: Sequence[str]) -> List[str]:
+    """
+    normalize_text를 문서 전체에 한 번에 적용한다(결과는 행별 호출과 동일).
+
+    문서를 줄바꿈으로 이어 붙인 하나의 문자열에 NFKC·소문자화·정규식 치환을 한 번씩만
+    수행한 뒤 다시 나눈다. 줄바꿈은 NFKC/소문자화에서 결합·변형되지 않는 안정 문자라
+    문서 경계를 넘는 변화가 없고, 원문 안의 줄바꿈은 어차피 공백으로 접히므로 미리 바꾼다.
+    """
+    if not texts:
+        return []
+    blob = _DOC_SEP.join("" if text is None else str(text).replace(_DOC_SEP, " ") for text in texts)
+    blob = unicodedata.normalize("NFKC", blob).lower()
+    blob = _NON_WORD.sub(" ", blob)
+    blob = _INLINE_WHITESPACE.sub(" ", blob)
+    blob = _SEP_PADDING.sub(_DOC_SEP, blob).strip(" ")
+    return blob.split(_DOC_SEP)
+
+
+def _token_core(token: str) -> Optional[str]:
+    """공백 토큰 하나를 불용어/숫자 필터와 조사·어미 제거를 거친 어간으로 바꾼다(제외 시 None)."""
+    if token in STOPWORDS:
+        return None
+    if token.isdigit():
+        return None
+    if _HAS_DIGIT.search(token):
+        return None
+    core = _strip_korean_suffix(token)
+    if core and core not in STOPWORDS:
+        return core
+    return None
+
+
+_cached_token_core = lru_cache(maxsize=65536)(_token_core)
+
+
 def tokenize(text: str, *, use_nouns: bool = True) -> List[str]:
     """
     공백 단위 토큰화 후 불용어·숫자 토큰을 제거한다.
@@ -108,19 +391,38 @@ def tokenize(text: str, *, use_nouns: bool = True) -> List[str]:
 
     # 2) fallback/보완: 공백 기반 토큰 + 조사/어미 제거
     for token in norm.split():
-        if token in STOPWORDS:
-            continue
-        if token.isdigit():
-            continue
-        if re.search(r"\d", token):
-            continue
-        core = _strip_korean_suffix(token)
-        if core and core not in STOPWORDS:
+        core = _cached_token_core(token)
+        if core:
             tokens.append(core)
     # 순서 보존 중복 제거
     return list(dict.fromkeys(tokens))
 
 
+def tokenize_batch(
+    texts: Sequence[str],
+    *,
+    use_nouns: bool = True,
+    noun_workers: Optional[int] = None,
+) -> List[List[str]]:
+    """
+    여러 문서를 한 번에 토큰화한다. 각 원소는 tokenize(text)와 같은 결과다.
+
+    정규화는 normalize_texts로 일괄 처리하고, 조사/어미 제거는 전체 문서의 고유 공백
+    토큰마다 한 번만 계산해 문서별로는 사전 조회만 한다. 명사 추출은
+    extract_nouns_batch(다중 프로세스 + 디스크 캐시)로 처리한다.
+    """
+    norms = normalize_texts(texts)
+    cores: Dict[str, Optional[str]] = {}
+    for token in set(_DOC_SEP.join(norms).split()):
+        cores[token] = _token_core(token)
+    nouns = extract_nouns_batch(norms, workers=noun_workers) if use_nouns else [[] for _ in norms]
+    results: List[List[str]] = []
+    for norm, tokens in zip(norms, nouns):
+        tokens.extend(core for core in map(cores.__getitem__, norm.split()) if core)
+        results.append(list(dict.fromkeys(tokens)))
+    return results
+
+
 def flatten_text(values: Sequence) -> str:
     """리스트/튜플 등을 펼쳐 하나의 문자열로 이어 붙인다."""
     parts = []
@@ -132,20 +434,28 @@ def flatten_text(values: Sequence) -> str:
     return " ".join(parts)
 
 
-def enrich_dataframe(df: pd.DataFrame, *, use_nouns: bool = True) -> pd.DataFrame:
+def enrich_dataframe(
+    df: pd.DataFrame,
+    *,
+    use_nouns: bool = True,
+    noun_workers: Optional[int] = None,
+) -> pd.DataFrame:
     """정규화된 텍스트/토큰/인기도 컬럼을 추가한 데이터프레임을 만든다."""
     df = df.copy().reset_index(drop=True)
-    df["text"] = df.apply(
-        lambda row: normalize_text(
-            flatten_text([row["title"], row.get("tags", []), row.get("category_path", [])])
-        ),
-        axis=1,
-    )
-    df["tokens"] = df["text"].apply(lambda s: tokenize(s, use_nouns=use_nouns))
-    pops = df["popularity"].astype(float)
-    pop_min, pop_max = pops.min(), pops.max()
-    if pop_max == pop_min:
-        df["popularity_norm"] = 0.5
-    else:
-        df["popularity_norm"] = (pops - pop_min) / (pop_max - pop_min)
+    n = len(df)
+    titles = df["title"].tolist() if "title" in df else [None] * n
+    tags = df["tags"].tolist() if "tags" in df else [[]] * n
+    paths = df["category_path"].tolist() if "category_path" in df else [[]] * n
+    texts = normalize_texts([flatten_text(values) for values in zip(titles, tags, paths)])
+    df["text"] = pd.Series(texts, index=df.index, dtype=object)
+    df["tokens"] = pd.Series(tokenize_batch(texts, use_nouns=use_nouns, noun_workers=noun_workers), index=df.index, dtype=object)
+    df["popularity_norm"] = normalize_popularity(df["popularity"].to_numpy())
     return df
+
+
+def normalize_popularity(popularity: np.ndarray) -> np.ndarray:
+    """인기도(리뷰 수)를 카탈로그 전체 min-max 기준 0~1로 정규화한다."""
+    pops = np.asarray(popularity, dtype=np.float64)
+    if not pops.size or pops.max() == pops.min():
+        return np.full(pops.shape, 0.5)
+    return (pops - pops.min()) / (pops.max() - pops.min())
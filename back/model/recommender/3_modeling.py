@@ -2,120 +2,466 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Sequence, Tuple
+import importlib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-import pandas as pd
-from gensim.models import Word2Vec
+from gensim.models import KeyedVectors, Word2Vec
 from gensim.models.callbacks import CallbackAny2Vec
 from scipy import sparse
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+_ann_module = importlib.import_module("ann_index")
+IVFIndex = _ann_module.IVFIndex
+should_build_ann = _ann_module.should_build
+
+_inverted_module = importlib.import_module("inverted_index")
+BM25Index = _inverted_module.BM25Index
+InvertedIndex = _inverted_module.InvertedIndex
+
+_neighbor_module = importlib.import_module("neighbor_table")
+NeighborTable = _neighbor_module.NeighborTable
+open_neighbor_table = _neighbor_module.open_neighbor_table
+
+build_slot_bits = importlib.import_module("4_slots_filters").build_slot_bits
+ProductFragments = importlib.import_module("catalog_store").ProductFragments
+
+_embedding_module = importlib.import_module("embedding_store")
+QuantizedEmbeddings = _embedding_module.QuantizedEmbeddings
+compress_embeddings = _embedding_module.compress_embeddings
+concat_rows = _embedding_module.concat_rows
+take_rows = _embedding_module.take_rows
+
+# 카탈로그 학습과 저장된 인덱스 복원이 같은 토크나이저 설정을 공유해야 한다.
+TFIDF_TOKEN_PATTERN = r"(?u)\b\w+\b"
+
+# tools/retrain_word2vec.py가 저장하는 사전 학습 W2V 아티팩트 위치(RECO_W2V_ARTIFACT=0이면 사용 안 함)
+USE_W2V_ARTIFACT = bool(int(os.getenv("RECO_W2V_ARTIFACT", "1")))
+_ENV_W2V_DIR = os.getenv("RECO_W2V_DIR")
+W2V_ARTIFACT_DIR = Path(_ENV_W2V_DIR) if _ENV_W2V_DIR else Path(__file__).resolve().parents[1] / "artifacts"
+W2V_ARTIFACT_PATTERN = "word2vec_logs_*.model"
+
+# BM25 인덱스 빌드 여부(RECO_BM25=0이면 bm25 요청도 TF-IDF로 처리)와 파라미터
+BM25_ENABLED = bool(int(os.getenv("RECO_BM25", "1")))
+BM25_K1 = float(os.getenv("RECO_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RECO_BM25_B", "0.75"))
 
 
 class _EpochLogger(CallbackAny2Vec):
-    """에폭 종료 시 진행률을 퍼센트로 로그 출력하는 콜백."""
+    """에폭 종료 시 진행률과 처리 속도(원시 단어/초)를 로그 출력하는 콜백."""
 
     def __init__(self, total_epochs: int, enabled: bool = True):
         self.total_epochs = total_epochs
         self.enabled = enabled
         self._current = 0
+        self._started = 0.0
+
+    def on_epoch_begin(self, model):
+        self._started = time.perf_counter()
 
     def on_epoch_end(self, model):
         if not self.enabled:
             return
         self._current += 1
         percent = (self._current / self.total_epochs) * 100
-        print(f"[progress] Word2Vec 학습 {percent:5.1f}% ({self._current}/{self.total_epochs})")
-
-
-def train_word2vec(corpus_tokens: List[List[str]], show_progress: bool = True) -> Word2Vec:
-    """카탈로그 코퍼스 토큰으로 소규모 skip-gram Word2Vec을 학습한다."""
-    epochs = 50
-    model = Word2Vec(
-        vector_size=100,
-        window=5,
-        min_count=1,
-        sg=1,
-        workers=1,
-        seed=42,
-    )
-    model.build_vocab(corpus_tokens)
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        rate = (model.corpus_total_words or 0) / elapsed
+        print(
+            f"[progress] Word2Vec 학습 {percent:5.1f}% ({self._current}/{self.total_epochs}) "
+            f"{elapsed:.1f}s, {rate:,.0f} words/s"
+        )
+
+
+def train_word2vec_streaming(
+    sentences: Iterable[List[str]],
+    previous: Optional[Word2Vec] = None,
+    *,
+    vector_size: int = 100,
+    window: int = 5,
+    min_count: int = 1,
+    sg: int = 1,
+    epochs: int = 5,
+    workers: Optional[int] = None,
+    seed: int = 42,
+    show_progress: bool = True,
+) -> Word2Vec:
+    """
+    재시작 가능한 문장 이터러블로 Word2Vec을 학습한다(코퍼스를 메모리에 올리지 않음).
+
+    - sentences는 제너레이터가 아니라 매번 처음부터 다시 순회되는 이터러블이어야 한다
+      (어휘 구축 1회 + 에폭 수만큼 순회).
+    - previous가 주어지면 그 모델의 어휘에 새 단어를 더하고(update=True) 이어서 학습한다.
+    - workers 기본값은 CPU 코어 수다.
+    """
+    workers = workers or os.cpu_count() or 1
+    if previous is not None:
+        model = previous
+        model.workers = workers
+        model.build_vocab(sentences, update=True)
+    else:
+        model = Word2Vec(
+            vector_size=vector_size,
+            window=window,
+            min_count=min_count,
+            sg=sg,
+            workers=workers,
+            seed=seed,
+        )
+        model.build_vocab(sentences)
+    if not model.corpus_count:
+        return model
     model.train(
-        corpus_tokens,
+        sentences,
         total_examples=model.corpus_count,
+        total_words=model.corpus_total_words,
         epochs=epochs,
         callbacks=[_EpochLogger(epochs, enabled=show_progress)],
     )
     return model
 
 
+def train_word2vec(
+    corpus_tokens: List[List[str]], show_progress: bool = True, workers: Optional[int] = None
+) -> Word2Vec:
+    """카탈로그 코퍼스 토큰으로 소규모 skip-gram Word2Vec을 학습한다(기본 전체 코어 사용)."""
+    return train_word2vec_streaming(corpus_tokens, epochs=50, workers=workers, show_progress=show_progress)
+
+
+def list_word2vec_artifacts(directory: Union[str, Path, None] = None) -> List[Path]:
+    """W2V 아티팩트를 최신순(파일명의 타임스탬프 기준)으로 나열한다."""
+    directory = Path(directory) if directory else W2V_ARTIFACT_DIR
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(W2V_ARTIFACT_PATTERN), key=lambda p: (p.name, p.stat().st_mtime_ns), reverse=True)
+
+
+def word2vec_identity(path: Union[str, Path]) -> Dict:
+    """인덱스 지문에 넣을 아티팩트 식별 정보(이름·크기·mtime)."""
+    stat = Path(path).stat()
+    return {"name": Path(path).name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _export_keyed_vectors(wv: KeyedVectors, kv_path: Path):
+    """
+    KeyedVectors를 벡터 배열이 별도 .npy로 분리된 형태로 저장한다.
+
+    임시 이름으로 쓴 뒤 배열 → .kv 순으로 옮기므로 .kv가 보이면 배열도 이미 제자리에 있다.
+    """
+    tmp = kv_path.with_name(f"{kv_path.name}.tmp{os.getpid()}")
+    wv.save(str(tmp), separately=["vectors"])
+    os.replace(f"{tmp}.vectors.npy", f"{kv_path}.vectors.npy")
+    os.replace(tmp, kv_path)
+
+
+def load_keyed_vectors(path: Union[str, Path]) -> KeyedVectors:
+    """
+    Word2Vec 아티팩트의 KeyedVectors를 메모리 매핑으로 연다.
+
+    옆에 ``.kv`` 파일(벡터만 분리 저장)이 없거나 오래됐으면 한 번 만들어 두고, 이후에는
+    그 파일을 mmap='r'로 열어 여러 워커 프로세스가 같은 페이지를 공유한다.
+    """
+    path = Path(path)
+    kv_path = path.with_suffix(".kv")
+    if not kv_path.exists() or kv_path.stat().st_mtime_ns < path.stat().st_mtime_ns:
+        wv = Word2Vec.load(str(path), mmap="r").wv
+        try:
+            _export_keyed_vectors(wv, kv_path)
+        except OSError:
+            return wv
+    return KeyedVectors.load(str(kv_path), mmap="r")
+
+
+def load_word2vec_artifact(
+    directory: Union[str, Path, None] = None,
+) -> Tuple[Optional[KeyedVectors], Optional[Dict]]:
+    """
+    사용할 수 있는 가장 최신 W2V 아티팩트를 (KeyedVectors, 식별 정보)로 반환한다.
+
+    읽을 수 없거나 벡터가 비어 있는 아티팩트는 건너뛰고, 하나도 없으면 (None, None).
+    """
+    if not USE_W2V_ARTIFACT:
+        return None, None
+    for path in list_word2vec_artifacts(directory):
+        try:
+            wv = load_keyed_vectors(path)
+        except Exception:
+            continue
+        if getattr(wv, "vectors", None) is None or wv.vectors.ndim != 2 or not len(wv):
+            continue
+        return wv, word2vec_identity(path)
+    return None, None
+
+
+def load_word2vec_neighbors(
+    wv: Optional[KeyedVectors], identity: Optional[Dict], directory: Union[str, Path, None] = None
+) -> Optional[NeighborTable]:
+    """
+    load_word2vec_artifact가 고른 아티팩트의 이웃 표를 연다.
+
+    표가 없거나 낡았으면 기동 중에 다시 계산하지 않고 None(질의 확장은 most_similar)을 돌려준다.
+    """
+    if wv is None or identity is None:
+        return None
+    directory = Path(directory) if directory else W2V_ARTIFACT_DIR
+    model_path = directory / identity["name"]
+    table = open_neighbor_table(model_path, wv)
+    if table is None:
+        print(
+            f"[progress] W2V 이웃 표가 없거나 모델과 맞지 않아 most_similar로 확장합니다: {model_path.name} "
+            f"(생성: python back/tools/retrain_word2vec.py --neighbors-only {model_path})"
+        )
+    return table
+
+
 def build_tfidf(texts: Sequence[str]) -> Tuple[TfidfVectorizer, sparse.spmatrix]:
     """제목+태그를 묶은 문서들에 TF-IDF 벡터라이저를 학습한다."""
-    vectorizer = TfidfVectorizer(token_pattern=r"(?u)\b\w+\b")
+    vectorizer = TfidfVectorizer(token_pattern=TFIDF_TOKEN_PATTERN)
     matrix = vectorizer.fit_transform(texts)
     return vectorizer, matrix
 
 
+def bm25_params() -> Dict:
+    """인덱스 아티팩트 지문에 들어갈 BM25 빌드 설정."""
+    return {"enabled": BM25_ENABLED, "k1": BM25_K1, "b": BM25_B}
+
+
+def build_bm25(texts: Sequence[str], query_vectorizer: "QueryVectorizer") -> BM25Index:
+    """TF-IDF와 같은 어휘·토큰 규칙으로 문서 길이/IDF를 구해 BM25 인덱스를 만든다."""
+    return BM25Index.from_counts(query_vectorizer.count_matrix(texts), BM25_K1, BM25_B)
+
+
+def restore_tfidf(vocabulary: Sequence[str], idf: np.ndarray) -> TfidfVectorizer:
+    """저장된 어휘(컬럼 순서)와 IDF 배열로 학습 완료 상태의 벡터라이저를 복원한다."""
+    vectorizer = TfidfVectorizer(
+        token_pattern=TFIDF_TOKEN_PATTERN,
+        vocabulary={term: idx for idx, term in enumerate(vocabulary)},
+    )
+    vectorizer.idf_ = np.asarray(idf, dtype=np.float64)
+    return vectorizer
+
+
+class QueryVectorizer:
+    """
+    학습된 TF-IDF 어휘/IDF로 질의 한 건을 희소 벡터로 바꾸는 경량 변환기.
+
+    TfidfVectorizer.transform과 같은 결과(소문자화 → 토큰 패턴 → 빈도 × IDF → L2 정규화)를
+    내되, 어휘 딕셔너리와 피처 배열은 환경마다 한 번만 만들어 재사용한다.
+    """
+
+    __slots__ = ("vocabulary", "features", "idf", "_pattern")
+
+    def __init__(self, features: Sequence[str], idf: np.ndarray):
+        self.features = np.asarray(features, dtype=object)
+        self.vocabulary = {term: col for col, term in enumerate(self.features.tolist())}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self._pattern = re.compile(TFIDF_TOKEN_PATTERN)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer: TfidfVectorizer) -> "QueryVectorizer":
+        return cls(vectorizer.get_feature_names_out(), vectorizer.idf_)
+
+    def counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """질의의 (열 번호 오름차순, 어휘 내 토큰 빈도)."""
+        counts: Dict[int, int] = {}
+        vocabulary = self.vocabulary
+        for token in self._pattern.findall(text.lower()):
+            col = vocabulary.get(token)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        cols = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+        return cols, np.fromiter((counts[col] for col in cols.tolist()), dtype=np.float64, count=len(cols))
+
+    def count_matrix(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """여러 문서의 (문서 × 어휘) 토큰 빈도 행렬(같은 토큰 규칙·고정 어휘)."""
+        if not len(texts):
+            return sparse.csr_matrix((0, len(self.idf)), dtype=np.int64)
+        counter = CountVectorizer(token_pattern=TFIDF_TOKEN_PATTERN, vocabulary=self.vocabulary)
+        return counter.transform(texts)
+
+    def terms(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """질의의 (열 번호 오름차순, L2 정규화된 TF-IDF 가중치)."""
+        cols, weights = self.counts(text)
+        weights *= self.idf[cols]
+        norm = np.linalg.norm(weights)
+        if norm > 0:
+            weights /= norm
+        return cols, weights
+
+    def transform(self, text: str) -> sparse.csr_matrix:
+        """질의를 (1 × 어휘 수) CSR 행으로 변환한다."""
+        cols, weights = self.terms(text)
+        indptr = np.array([0, len(cols)], dtype=np.int32)
+        return sparse.csr_matrix((weights, cols, indptr), shape=(1, len(self.idf)))
+
+
+def align_word_vectors(
+    features: Sequence[str], model: Optional[Word2Vec]
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    TF-IDF 어휘 순서에 맞춘 (피처 × 차원) W2V 행렬과 어휘 포함 여부(0/1) 벡터를 만든다.
+
+    W2V 어휘에 없는 피처는 0 행이 되며, 모델이 없으면 (None, None)을 반환한다.
+    """
+    if model is None:
+        return None, None
+    wv = getattr(model, "wv", model)
+    key_to_index = wv.key_to_index
+    rows = np.fromiter((key_to_index.get(token, -1) for token in features), dtype=np.int64, count=len(features))
+    in_vocab = rows >= 0
+    matrix = np.zeros((len(features), wv.vector_size), dtype=np.float32)
+    matrix[in_vocab] = wv.vectors[rows[in_vocab]]
+    return matrix, in_vocab.astype(np.float32)
+
+
+def weighted_embeddings(
+    tfidf_rows: sparse.spmatrix,
+    feature_vectors: Optional[np.ndarray],
+    feature_in_vocab: Optional[np.ndarray],
+) -> np.ndarray:
+    """
+    TF-IDF 가중 W2V 평균을 모든 행에 대해 한 번에 계산한다.
+
+    (행 × 피처) 희소 행렬과 정렬된 피처 행렬의 곱을 어휘 내 피처 가중치 합으로 나눈다.
+    모델이 없으면 행마다 길이 1짜리 0 벡터를 돌려준다.
+    """
+    n_rows = tfidf_rows.shape[0]
+    if feature_vectors is None:
+        return np.zeros((n_rows, 1), dtype=np.float32)
+    rows = sparse.csr_matrix(tfidf_rows, dtype=np.float32)
+    sums = np.asarray(rows @ feature_vectors, dtype=np.float32)
+    weights = rows @ feature_in_vocab
+    nonzero = weights > 0
+    sums[nonzero] /= weights[nonzero, None]
+    return sums
+
+
 def tfidf_weighted_embedding(
-    row_vec: sparse.spmatrix, features: np.ndarray, model: Optional[Word2Vec]
+    row_vec: sparse.spmatrix,
+    feature_vectors: Optional[np.ndarray],
+    feature_in_vocab: Optional[np.ndarray],
 ) -> np.ndarray:
-    """TF-IDF 가중치를 활용해 토큰 임베딩 평균을 구한다."""
-    if model is None:  # Word2Vec 학습을 건너뛴 경우
+    """TF-IDF 가중치를 활용해 토큰 임베딩 평균을 구한다(문서 임베딩과 같은 정렬 행렬 사용)."""
+    if feature_vectors is None:  # Word2Vec 학습을 건너뛴 경우
         return np.zeros(1, dtype=np.float32)
-    vec = np.zeros(model.vector_size, dtype=np.float32)
-    if row_vec.nnz == 0:
-        return vec
-    coo = row_vec.tocoo()
-    weight_sum = 0.0
-    for idx, value in zip(coo.col, coo.data):
-        token = features[idx]
-        if token in model.wv:
-            vec += model.wv[token] * float(value)
-            weight_sum += float(value)
-    if weight_sum > 0:
-        vec /= weight_sum
-    return vec
+    return weighted_embeddings(row_vec, feature_vectors, feature_in_vocab)[0]
+
+
+def normalize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    행 단위 L2 정규화된 C-연속 float32 행렬과 노름이 0인 행의 마스크를 만든다.
+
+    노름 0 행은 그대로 0 벡터로 남으므로 어떤 질의와도 유사도가 0이다.
+    """
+    emb = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1)
+    zero_norm = norms == 0
+    unit = emb / np.where(zero_norm, 1.0, norms).astype(np.float32)[:, None]
+    return np.ascontiguousarray(unit, dtype=np.float32), zero_norm
 
 
 def cosine_sim_dense(query_vec: np.ndarray, doc_embeddings: np.ndarray) -> np.ndarray:
-    """밀집 쿼리 벡터와 모든 문서 임베딩의 코사인 유사도를 계산한다."""
+    """
+    밀집 쿼리 벡터와 모든 문서 임베딩의 코사인 유사도를 계산한다.
+
+    doc_embeddings는 normalize_rows로 미리 정규화된 행렬이라 질의 노름만 나누면
+    행렬-벡터 곱 한 번으로 끝난다.
+    """
     if not doc_embeddings.size:
         return np.zeros(0, dtype=np.float32)
     q_norm = np.linalg.norm(query_vec)
     if q_norm == 0:
         return np.zeros(doc_embeddings.shape[0], dtype=np.float32)
-    doc_norms = np.linalg.norm(doc_embeddings, axis=1)
-    denom = doc_norms * q_norm
-    denom[denom == 0] = 1e-8
-    sims = doc_embeddings.dot(query_vec) / denom
-    sims[doc_norms == 0] = 0.0
-    return sims.astype(np.float32)
+    query_unit = (np.asarray(query_vec, dtype=np.float32) / np.float32(q_norm)).astype(np.float32)
+    return doc_embeddings @ query_unit
 
 
 def build_item_vectors(
-    df: pd.DataFrame,
+    catalog,
     w2v: Optional[Word2Vec],
     vectorizer: TfidfVectorizer,
     tfidf_matrix: sparse.spmatrix,
+    w2v_neighbors: Optional[NeighborTable] = None,
 ) -> Dict:
-    """카탈로그 아이템마다 TF-IDF·W2V 기반 임베딩/토큰 집합을 캐시한다."""
-    features = vectorizer.get_feature_names_out()
-    embeddings = []
-    token_sets = []
-    for idx in range(len(df)):
-        tokens = set(df.iloc[idx]["tokens"])
-        token_sets.append(tokens)
-        row_vec = tfidf_matrix[idx]
-        embedding = tfidf_weighted_embedding(row_vec, features, w2v)
-        embeddings.append(embedding)
-    if not embeddings:
-        doc_embeddings = np.zeros((0, 1), dtype=np.float32)
-    else:
-        doc_embeddings = np.vstack(embeddings)
+    """
+    카탈로그 아이템마다 TF-IDF·W2V 기반 임베딩과 검색용 인덱스를 캐시한다.
+
+    w2v_neighbors는 W2V 어휘의 이웃 표로, 질의 확장이 most_similar 대신 조회한다.
+    """
+    query_vectorizer = QueryVectorizer.from_vectorizer(vectorizer)
+    feature_vectors, feature_in_vocab = align_word_vectors(query_vectorizer.features, w2v)
+    unit_embeddings, doc_zero_norm = normalize_rows(weighted_embeddings(tfidf_matrix, feature_vectors, feature_in_vocab))
+    ann_index = None
+    if should_build_ann(len(unit_embeddings), feature_vectors is not None and not doc_zero_norm.all()):
+        ann_index = IVFIndex.build(unit_embeddings, doc_zero_norm)
+    # 중심 학습은 원 정밀도로 하고, 보관용 행렬만 설정된 형식(float32/float16/int8)으로 압축한다.
+    doc_embeddings = compress_embeddings(unit_embeddings)
     return {
         "tfidf_vectorizer": vectorizer,
         "tfidf_matrix": tfidf_matrix,
+        "query_vectorizer": query_vectorizer,
+        # 행 단위로 정규화된 임베딩(코사인 = 내적, 압축 시 QuantizedEmbeddings)과 노름 0 행 마스크
         "doc_embeddings": doc_embeddings,
-        "doc_token_sets": token_sets,
+        "doc_zero_norm": doc_zero_norm,
+        # 의미 후보 검색용 IVF 인덱스(작은 카탈로그나 W2V가 없으면 None → 전체 계산)
+        "ann_index": ann_index,
+        # TF-IDF를 전치한 CSC 포스팅(질의 유사도는 질의 어휘 열만 더한다)
+        "inverted_index": InvertedIndex.from_tfidf(tfidf_matrix),
+        # BM25 가중치 포스팅(요청별로 어휘 엔진을 고를 수 있도록 함께 둔다)
+        "bm25_index": build_bm25(list(catalog.texts()), query_vectorizer) if BM25_ENABLED else None,
+        # 상품별 금기/상황·관계 힌트 비트셋(질의 시 필터·맥락 점수를 마스크 연산으로 계산)
+        "slot_bits": build_slot_bits(catalog.texts()),
+        # 상품별 응답 문구 조각(가격/태그/평점·인기/예산대)
+        "fragments": ProductFragments.from_catalog(catalog),
+        "feature_vectors": feature_vectors,
+        "feature_in_vocab": feature_in_vocab,
         "w2v": w2v,
+        "w2v_neighbors": w2v_neighbors,
+    }
+
+
+def extend_item_vectors(vectors: Dict, keep: np.ndarray, added_catalog) -> Dict:
+    """
+    기존 캐시에서 keep 행만 남기고 추가 상품을 덧붙인 새 vectors를 만든다.
+
+    TF-IDF·BM25는 기존 어휘/IDF(BM25는 평균 길이 포함)로 추가 행만 계산하고, 임베딩·슬롯 비트셋도 추가 행만 계산한다.
+    원본 dict는 수정하지 않으므로 호출 측이 완성된 결과를 한 번에 교체할 수 있다.
+    """
+    vectorizer = vectors["tfidf_vectorizer"]
+    keep = np.asarray(keep, dtype=np.int64)
+    if len(added_catalog):
+        added_tfidf = vectorizer.transform(list(added_catalog.texts()))
+    else:  # 삭제만 있는 갱신: 빈 입력은 TfidfVectorizer가 거부한다.
+        added_tfidf = sparse.csr_matrix((0, len(vectorizer.idf_)), dtype=vectors["tfidf_matrix"].dtype)
+    added_embeddings, added_zero_norm = normalize_rows(
+        weighted_embeddings(added_tfidf, vectors["feature_vectors"], vectors["feature_in_vocab"])
+    )
+    base_embeddings = vectors["doc_embeddings"]
+    storage = base_embeddings.dtype_name if isinstance(base_embeddings, QuantizedEmbeddings) else "float32"
+    doc_embeddings = concat_rows(take_rows(base_embeddings, keep), compress_embeddings(added_embeddings, storage))
+    doc_zero_norm = np.concatenate([np.asarray(vectors["doc_zero_norm"])[keep], added_zero_norm])
+    ann_index = vectors.get("ann_index")
+    if ann_index is not None:
+        ann_index = ann_index.update(keep, added_embeddings, added_zero_norm)
+    tfidf_matrix = sparse.vstack([vectors["tfidf_matrix"][keep], added_tfidf], format="csr")
+    bm25_index = vectors.get("bm25_index")
+    if bm25_index is not None:
+        bm25_index = bm25_index.extend(keep, vectors["query_vectorizer"].count_matrix(list(added_catalog.texts())))
+    added_bits = build_slot_bits(added_catalog.texts())
+    return {
+        **vectors,
+        "tfidf_matrix": tfidf_matrix,
+        "doc_embeddings": doc_embeddings,
+        "doc_zero_norm": doc_zero_norm,
+        "ann_index": ann_index,
+        "inverted_index": InvertedIndex.from_tfidf(tfidf_matrix),
+        "bm25_index": bm25_index,
+        "slot_bits": {
+            kind: np.concatenate([np.asarray(bits)[keep], added_bits[kind]])
+            for kind, bits in vectors["slot_bits"].items()
+        },
+        "fragments": vectors["fragments"].take(keep).concat(ProductFragments.from_catalog(added_catalog)),
     }
@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
+import hashlib
 import importlib
+import json
 import re
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from gensim.models import Word2Vec
+import numpy as np
+from gensim.models import KeyedVectors, Word2Vec
 
 _text_utils = importlib.import_module("2_text_processing")
 normalize_text = _text_utils.normalize_text
@@ -19,14 +22,34 @@ FORBIDDEN_SYNONYMS = _slots.FORBIDDEN_SYNONYMS
 OCCASION_HINTS = _slots.OCCASION_HINTS
 RELATION_HINTS = _slots.RELATION_HINTS
 
+SlotAutomaton = importlib.import_module("slot_automaton").SlotAutomaton
 
-def _find_slot_by_map(text: str, mapping: Dict[str, List[str]]) -> str:
-    """미리 정의한 키워드 맵에서 일치하는 슬롯 값을 찾는다."""
-    for slot, candidates in mapping.items():
-        for candidate in candidates:
-            if candidate in text:
-                return slot
-    return ""
+# 슬롯 사전 전체를 임포트 시 한 번 컴파일한다. 힌트가 없는 슬롯은 슬롯 이름 자체가 힌트다.
+_SLOT_GROUPS = {
+    "occasion": OCCASION_MAP,
+    "relation": RELATION_MAP,
+    "forbidden": FORBIDDEN_SYNONYMS,
+    "occasion_hint": {**{slot: [slot] for slot in OCCASION_MAP}, **OCCASION_HINTS},
+    "relation_hint": {**{slot: [slot] for slot in RELATION_MAP}, **RELATION_HINTS},
+}
+SLOT_AUTOMATON = SlotAutomaton(_SLOT_GROUPS)
+# 사전이 바뀌면 상품별 슬롯 비트셋도 다시 만들어야 하므로 인덱스 지문에 넣는다.
+SLOT_DICTIONARY_DIGEST = hashlib.sha1(
+    json.dumps(_SLOT_GROUPS, ensure_ascii=False, sort_keys=True).encode("utf-8")
+).hexdigest()
+
+# 상품별로 미리 계산해 두는 비트셋 종류(금기 표준 키, 상황/관계 힌트 그룹). 비트 번호 = 사전 정의 순서
+SLOT_BIT_KINDS = ("forbidden", "occasion_hint", "relation_hint")
+for _kind in SLOT_BIT_KINDS:
+    if len(SLOT_AUTOMATON.order[_kind]) > 64:
+        raise ValueError(f"슬롯 비트셋은 종류당 64개 키까지 지원합니다: {_kind}")
+
+# 핵심 키워드에서 제외할 토큰(슬롯·금기 표현과 예산 단위)
+SPECIAL_TOKENS = frozenset(
+    [name for mapping in (OCCASION_MAP, RELATION_MAP) for names in mapping.values() for name in names]
+    + ["이상", "이하", "만원", "만", "천", "예산", "budget"]
+    + [item for pats in FORBIDDEN_SYNONYMS.values() for item in pats]
+)
 
 
 def _parse_budget(text: str) -> Tuple[int, int]:
@@ -75,28 +98,17 @@ def extract_slots(query: str) -> Dict:
     """질의에서 예산, 상황, 관계, 금기, 핵심 키워드를 추출한다."""
     normalized = normalize_text(query)
     budget_min, budget_max = _parse_budget(normalized)
-    occasion = _find_slot_by_map(normalized, OCCASION_MAP) or ""
-    relation = _find_slot_by_map(normalized, RELATION_MAP) or ""
-
-    forbidden = set()
-    for canonical, patterns in FORBIDDEN_SYNONYMS.items():
-        for pattern in patterns:
-            if pattern in normalized:
-                forbidden.add(canonical)
-                break
+    # 상황/관계/금기 표현을 오토마톤 한 번의 순회로 모두 찾는다(맵에서 먼저 정의된 슬롯 우선).
+    matched = SLOT_AUTOMATON.match(normalized)
+    occasion = SLOT_AUTOMATON.first("occasion", matched["occasion"])
+    relation = SLOT_AUTOMATON.first("relation", matched["relation"])
+    forbidden = matched["forbidden"]
 
     tokens = tokenize(query)
-    special_tokens = set()
-    for mapping in (OCCASION_MAP, RELATION_MAP):
-        for names in mapping.values():
-            special_tokens.update(names)
-    special_tokens.update(["이상", "이하", "만원", "만", "천", "예산", "budget"])
-    special_tokens.update(item for pats in FORBIDDEN_SYNONYMS.values() for item in pats)
-
     core = []
     seen = set()
     for token in tokens:
-        if token in special_tokens:
+        if token in SPECIAL_TOKENS:
             continue
         if re.search(r"\d", token):
             continue
@@ -116,18 +128,28 @@ def extract_slots(query: str) -> Dict:
     }
 
 
-def expand_keywords(core: List[str], model: Optional[Word2Vec], forbidden: Set[str]) -> List[str]:
-    """핵심 키워드를 Word2Vec 유사 단어로 확장한다."""
+def expand_keywords(
+    core: List[str],
+    model: Optional[Union[Word2Vec, KeyedVectors]],
+    forbidden: Set[str],
+    neighbors=None,
+) -> List[str]:
+    """
+    핵심 키워드를 Word2Vec(또는 KeyedVectors) 유사 단어로 확장한다.
+
+    neighbors(미리 계산한 이웃 표)가 있으면 most_similar 대신 표의 행을 읽는다.
+    """
     if model is None:  # Word2Vec 학습을 건너뛰는 경우 코어만 사용
         return list(dict.fromkeys(core))
+    wv = neighbors if neighbors is not None else getattr(model, "wv", model)
     expanded = list(dict.fromkeys(core))
     if not core:
         return expanded
     for keyword in core:
-        if keyword not in model.wv:
+        if keyword not in wv:
             continue
         added = 0
-        for candidate, score in model.wv.most_similar(keyword, topn=5):
+        for candidate, score in wv.most_similar(keyword, topn=5):
             if score < 0.4:
                 continue
             if candidate in expanded or candidate in forbidden:
@@ -143,11 +165,9 @@ def expand_keywords(core: List[str], model: Optional[Word2Vec], forbidden: Set[s
 
 def violates_forbidden(text: str, forbidden: Set[str]) -> bool:
     """상품 텍스트가 금기어 집합과 충돌하는지 여부를 반환한다."""
-    for canonical in forbidden:
-        for pattern in FORBIDDEN_SYNONYMS.get(canonical, []):
-            if pattern in text:
-                return True
-    return False
+    if not forbidden:
+        return False
+    return not forbidden.isdisjoint(SLOT_AUTOMATON.match(text)["forbidden"])
 
 
 def describe_guard(text: str, forbidden: Set[str]) -> str:
@@ -169,37 +189,82 @@ def describe_guard(text: str, forbidden: Set[str]) -> str:
     return "금기 충족: " + "/".join(hits[:2])
 
 
-def compute_budget_fit(price: int, budget_min: int, budget_max: int) -> Tuple[float, bool]:
-    """가격이 예산 범위와 얼마나 가까운지 (및 이탈 여부)를 계산한다."""
+def build_slot_bits(texts: Iterable[str]) -> Dict[str, np.ndarray]:
+    """상품 텍스트마다 금기 표준 키·상황/관계 힌트 그룹의 포함 여부를 uint64 비트셋으로 만든다."""
+    rows: Dict[str, List[int]] = {kind: [] for kind in SLOT_BIT_KINDS}
+    for text in texts:
+        matched = SLOT_AUTOMATON.match(text)
+        for kind in SLOT_BIT_KINDS:
+            order = SLOT_AUTOMATON.order[kind]
+            rows[kind].append(sum(1 << order[key] for key in matched[kind]))
+    return {kind: np.asarray(values, dtype=np.uint64) for kind, values in rows.items()}
+
+
+def _slot_mask(kind: str, keys: Iterable[str]) -> np.uint64:
+    order = SLOT_AUTOMATON.order[kind]
+    return np.uint64(sum(1 << order[key] for key in keys if key in order))
+
+
+def forbidden_mask(slot_bits: Dict[str, np.ndarray], forbidden: Set[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """rows(없으면 전체) 상품별 금기 위반 여부. violates_forbidden의 비트셋 버전이다."""
+    bits = slot_bits["forbidden"] if rows is None else slot_bits["forbidden"][rows]
+    return (bits & _slot_mask("forbidden", forbidden)) != 0
+
+
+def context_scores(
+    slot_bits: Dict[str, np.ndarray],
+    slots: Dict,
+    rows: Optional[np.ndarray] = None,
+    text_of: Optional[Callable[[int], str]] = None,
+) -> np.ndarray:
+    """
+    rows(없으면 전체) 상품별 맥락 가점을 비트셋 연산으로 구한다.
+
+    질의의 occasion/relation 힌트가 상품 텍스트에 드러나면 각각 0.06점(합계 최대 0.12)을 준다.
+    사전에 없는 슬롯 값은 text_of(doc_index)로 텍스트에 그 이름이 있는지 직접 확인한다(없으면 미충족).
+    """
+    n_rows = len(slot_bits["forbidden"]) if rows is None else len(rows)
+    score = np.zeros(n_rows, dtype=np.float64)
+    for kind, slot in (("occasion_hint", slots.get("occasion")), ("relation_hint", slots.get("relation"))):
+        if not slot:
+            continue
+        bit = SLOT_AUTOMATON.order[kind].get(slot)
+        if bit is not None:
+            bits = slot_bits[kind] if rows is None else slot_bits[kind][rows]
+            hit = (bits & np.uint64(1 << bit)) != 0
+        elif text_of is not None:
+            ids = range(n_rows) if rows is None else rows.tolist()
+            hit = np.fromiter((slot in text_of(idx) for idx in ids), dtype=bool, count=n_rows)
+        else:
+            continue
+        score[hit] += 0.06
+    return np.minimum(score, 0.12)
+
+
+def budget_fit_scores(
+    prices: np.ndarray, budget_min: Optional[int], budget_max: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    가격 배열이 예산 범위와 얼마나 가까운지 (적합도, 이탈 여부) 배열로 한 번에 계산한다.
+
+    - 예산이 없으면 적합도 1, 이탈 없음.
+    - 중심값 mid는 양쪽이 있으면 가운데, 상한만 있으면 상한, 하한만 있으면 하한(최소 1)이다.
+    - 적합도는 max(0, 1 - |가격 - mid| / mid)이고, 하한 미만·상한 초과(이탈)이면 0.4배로 깎는다.
+    """
+    prices = np.asarray(prices)
     if budget_min is None and budget_max is None:
-        return 1.0, False
+        return np.ones(len(prices), dtype=np.float64), np.zeros(len(prices), dtype=bool)
     lo = budget_min if budget_min is not None else 0
-    hi = budget_max if budget_max is not None else max(price, lo)
-    mid = (lo + hi) / 2 if (budget_min is not None and budget_max is not None) else (hi if budget_max else lo)
+    # 중심값은 가격과 무관하다(양쪽이 있으면 가운데, 상한만 있으면 상한, 하한만 있으면 하한).
+    if budget_min is not None and budget_max is not None:
+        mid = (lo + budget_max) / 2
+    else:
+        mid = budget_max if budget_max else lo
     mid = max(mid, 1.0)
-    diff = abs(price - mid)
-    score = max(0.0, 1 - diff / max(mid, 1.0))
-    outside = False
-    if budget_min is not None and price < budget_min:
-        outside = True
-    if budget_max is not None and price > budget_max:
-        outside = True
-    if outside:
-        score *= 0.4
-    return score, outside
-
-
-def compute_context_score(text: str, slots: Dict) -> float:
-    """occasion/relation이 상품 텍스트에 드러나면 추가 가점을 준다."""
-    score = 0.0
-    occasion = slots.get("occasion")
-    relation = slots.get("relation")
-    if occasion:
-        hints = OCCASION_HINTS.get(occasion, [occasion])
-        if any(hint in text for hint in hints):
-            score += 0.06
-    if relation:
-        hints = RELATION_HINTS.get(relation, [relation])
-        if any(hint in text for hint in hints):
-            score += 0.06
-    return min(score, 0.12)
+    score = np.maximum(0.0, 1 - np.abs(prices - mid) / max(mid, 1.0))
+    outside = np.zeros(len(prices), dtype=bool)
+    if budget_min is not None:
+        outside |= prices < budget_min
+    if budget_max is not None:
+        outside |= prices > budget_max
+    return np.where(outside, score * 0.4, score), outside
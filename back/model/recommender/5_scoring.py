@@ -3,124 +3,324 @@
 from __future__ import annotations
 
 import importlib
-from typing import Dict, List
+import os
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 
 _text_utils = importlib.import_module("2_text_processing")
 normalize_text = _text_utils.normalize_text
 tokenize = _text_utils.tokenize
 
 _modeling = importlib.import_module("3_modeling")
-cosine_sim_dense = _modeling.cosine_sim_dense
 tfidf_weighted_embedding = _modeling.tfidf_weighted_embedding
 
+ANN_TOP_M = importlib.import_module("ann_index").ANN_TOP_M
+_inverted_module = importlib.import_module("inverted_index")
+LEXICAL_ENGINE = _inverted_module.LEXICAL_ENGINE
+LEXICAL_ENGINES = _inverted_module.LEXICAL_ENGINES
+LEXICAL_TOP_K = _inverted_module.LEXICAL_TOP_K
+use_pruning = _inverted_module.use_pruning
+
 _slot_helpers = importlib.import_module("4_slots_filters")
-compute_budget_fit = _slot_helpers.compute_budget_fit
-compute_context_score = _slot_helpers.compute_context_score
+budget_fit_scores = _slot_helpers.budget_fit_scores
+context_scores = _slot_helpers.context_scores
 describe_guard = _slot_helpers.describe_guard
+forbidden_mask = _slot_helpers.forbidden_mask
 violates_forbidden = _slot_helpers.violates_forbidden
 
+_catalog_module = importlib.import_module("catalog_store")
+format_budget_band = _catalog_module.format_budget_band
+format_stats = _catalog_module.format_stats
+
+# 최종 점수 가중치(유사도·예산 적합도·맥락·인기도)와 예산 이탈 감점
+W2V_WEIGHT = 0.35
+LEXICAL_WEIGHT = 0.25
+BUDGET_WEIGHT = 0.20
+CONTEXT_WEIGHT = 0.10
+POPULARITY_WEIGHT = 0.10
+BUDGET_OUTSIDE_PENALTY = 0.03
+# score_items의 기본 상위 상품 수(0이면 살아남은 후보 전부). run_query는 MMR 풀 제한이 없을 때 이 값을 쓴다
+SCORE_POOL = int(os.getenv("RECO_SCORE_POOL", "1000"))
+
+
+def static_prior(catalog) -> np.ndarray:
+    """질의와 무관한 상품별 사전 점수(인기도 항). 환경 빌드·증분 반영 때 한 번 계산해 둔다."""
+    return POPULARITY_WEIGHT * np.asarray(catalog.popularity_norm, dtype=np.float64)
+
+
+def lexical_scores(
+    query_tfidf,
+    vectors: Dict,
+    top_k: Optional[int] = None,
+    engine: Optional[str] = None,
+    query_text: str = "",
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    문서별 어휘 유사도(0~1)와 어휘 후보(doc_index 오름차순)를 구한다.
+
+    - tfidf: TF-IDF 행과 질의가 모두 L2 정규화되어 있어 코사인은 질의 어휘 열의 포스팅 합이다.
+    - bm25: 질의 내 빈도 × BM25 포스팅 합을 질의별 최댓값으로 나눠 0~1로 맞춘다
+      (BM25 인덱스가 없으면 tfidf로 처리).
+    가지치기가 켜져 있으면 MaxScore로 상위 top_k 문서만 정확히 계산하고, 아니면 전체를
+    계산하며 후보는 None(전체)이다. 질의에 아는 어휘가 없으면 전부 0이다.
+    """
+    engine = (engine or LEXICAL_ENGINE).lower()
+    if engine not in LEXICAL_ENGINES:
+        raise ValueError(f"지원하지 않는 어휘 점수 엔진입니다: {engine} (가능: {', '.join(LEXICAL_ENGINES)})")
+    index = vectors.get("bm25_index") if engine == "bm25" else None
+    if index is not None:
+        terms, weights = vectors["query_vectorizer"].counts(query_text)
+    else:
+        index = vectors["inverted_index"]
+        terms, weights = query_tfidf.indices, query_tfidf.data
+    if not len(terms):
+        return np.zeros(index.n_docs, dtype=np.float64), None
+    if not use_pruning(index.n_docs):
+        ids, sim = None, index.scores(terms, weights)
+    else:
+        ids, scores = index.top_k(terms, weights, top_k or LEXICAL_TOP_K)
+        sim = np.zeros(index.n_docs, dtype=np.float64)
+        sim[ids] = scores
+    if index is vectors.get("bm25_index") and sim.size and sim.max() > 0:
+        sim /= sim.max()
+    return sim, ids
+
+
+def semantic_scores(
+    query_embedding: np.ndarray,
+    vectors: Dict,
+    sim_tfidf: np.ndarray,
+    lexical: Optional[np.ndarray] = None,
+    ann_top_m: Optional[int] = None,
+    ann_nprobe: Optional[int] = None,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    문서별 W2V 유사도와 최종 스코어링 후보(doc_index 오름차순, 전체면 None)를 구한다.
+
+    - ANN 인덱스가 있으면 의미 상위 ann_top_m개와 어휘 후보(없으면 TF-IDF가 겹치는 문서)를
+      합쳐 후보로 삼고, 그 후보에 대해서만 정확한 유사도를 계산한다(나머지는 0).
+    - ANN 없이 어휘 후보만 있으면 전체 유사도 중 상위 ann_top_m개를 어휘 후보에 더한다.
+    - 둘 다 없으면 전체를 계산하고 후보는 None이다.
+    """
+    doc_embeddings = vectors["doc_embeddings"]
+    ann_index = vectors.get("ann_index")
+    q_norm = float(np.linalg.norm(query_embedding))
+    if q_norm == 0:
+        return np.zeros(doc_embeddings.shape[0], dtype=np.float32), lexical
+    query_unit = (query_embedding / q_norm).astype(np.float32)
+    if ann_index is None:
+        sim_w2v = doc_embeddings @ query_unit
+        if lexical is None:
+            return sim_w2v, None
+        top_m = min(ann_top_m or ANN_TOP_M, len(sim_w2v))
+        semantic = np.argpartition(-sim_w2v, top_m - 1)[:top_m] if top_m else np.zeros(0, dtype=np.int64)
+        return sim_w2v, np.union1d(lexical, semantic)
+    ann_ids, _ = ann_index.search(doc_embeddings, query_unit, top_m=ann_top_m, n_probe=ann_nprobe)
+    candidates = np.union1d(ann_ids, lexical if lexical is not None else np.flatnonzero(sim_tfidf > 0))
+    sim_w2v = np.zeros(doc_embeddings.shape[0], dtype=np.float32)
+    sim_w2v[candidates] = doc_embeddings[candidates] @ query_unit
+    return sim_w2v, candidates
+
+
+class ScoredItems:
+    """
+    score_items 결과: 점수 내림차순 후보의 doc_index와 점수 성분 배열.
+
+    MMR은 배열만 보고 고르며, 행(데이터프레임)은 to_frame으로 최종 K개에 대해서만 만든다.
+    """
+
+    __slots__ = (
+        "doc_index",
+        "score",
+        "sim_w2v",
+        "sim_tfidf",
+        "budget_fit",
+        "budget_outside",
+        "context_score",
+        "query_terms",
+    )
+
+    def __init__(self, doc_index, score, sim_w2v, sim_tfidf, budget_fit, budget_outside, context_score, query_terms):
+        self.doc_index = doc_index
+        self.score = score
+        self.sim_w2v = sim_w2v
+        self.sim_tfidf = sim_tfidf
+        self.budget_fit = budget_fit
+        self.budget_outside = budget_outside
+        self.context_score = context_score
+        self.query_terms = query_terms
+
+    @classmethod
+    def empty_result(cls, query_terms: List[str]) -> "ScoredItems":
+        none = np.zeros(0, dtype=np.float64)
+        return cls(np.zeros(0, dtype=np.int64), none, none, none, none, np.zeros(0, dtype=bool), none, query_terms)
+
+    def __len__(self) -> int:
+        return len(self.doc_index)
+
+    @property
+    def empty(self) -> bool:
+        return not len(self.doc_index)
+
+    def to_frame(self, catalog, positions: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """positions(없으면 전체) 후보만 행으로 펼친다. 일치 키워드도 이 행들에 대해서만 구한다."""
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        if not len(positions):
+            return pd.DataFrame()
+        doc_index = self.doc_index[positions]
+        return pd.DataFrame(
+            {
+                "doc_index": doc_index,
+                "product_id": catalog.product_id[doc_index],
+                "score": self.score[positions],
+                "sim_w2v": self.sim_w2v[positions],
+                "sim_tfidf": self.sim_tfidf[positions],
+                "budget_fit": self.budget_fit[positions],
+                "budget_outside": self.budget_outside[positions],
+                "context_score": self.context_score[positions],
+                "matched_keywords": catalog.keyword_matrix().matches(doc_index, self.query_terms),
+                "query_terms": [self.query_terms] * len(doc_index),
+            }
+        )
+
 
 def score_items(
     query_terms: List[str],
     query_text: str,
-    df: pd.DataFrame,
+    catalog,
     vectors: Dict,
     slots: Dict,
     hard_budget: bool = False,
-) -> pd.DataFrame:
-    """TF-IDF·W2V 유사도와 룰 기반 보정을 합산해 전 상품을 스코어링한다."""
-    vectorizer = vectors["tfidf_vectorizer"]
-    tfidf_matrix = vectors["tfidf_matrix"]
-    doc_embeddings = vectors["doc_embeddings"]
-    doc_token_sets = vectors["doc_token_sets"]
-    w2v = vectors["w2v"]
-    features = vectorizer.get_feature_names_out()
+    ann_top_m: Optional[int] = None,
+    ann_nprobe: Optional[int] = None,
+    lexical_top_k: Optional[int] = None,
+    lexical_engine: Optional[str] = None,
+    top_n: Optional[int] = None,
+) -> ScoredItems:
+    """
+    TF-IDF·W2V 유사도와 룰 기반 보정을 합산해 전 상품을 스코어링한다.
 
+    결과는 점수 내림차순 상위 top_n개(None이면 RECO_SCORE_POOL, 0이면 전부)의 ScoredItems이며
+    product_id는 중복되지 않는다. 상품 필드·일치 키워드는 최종 행을 만들 때 카탈로그에서 읽는다.
+    역색인/ANN 인덱스가 있으면 lexical_scores·semantic_scores가 고른 후보만 스코어링한다
+    (lexical_top_k, ann_* 인자는 후보 검색 설정, lexical_engine은 tfidf/bm25 선택).
+    sim_tfidf 컬럼에는 선택한 엔진의 어휘 유사도가 담긴다.
+    """
     if not query_terms:
         query_terms = tokenize(query_text)[:6]
     joined = " ".join(query_terms) if query_terms else normalize_text(query_text)
 
-    query_tfidf = vectorizer.transform([joined])
-    query_embedding = tfidf_weighted_embedding(query_tfidf, features, w2v)
-    sim_tfidf = cosine_similarity(query_tfidf, tfidf_matrix).ravel()
-    sim_w2v = cosine_sim_dense(query_embedding, doc_embeddings)
-
-    records = []
-    for idx, row in df.iterrows():
-        doc_text = row["text"]
-        if violates_forbidden(doc_text, slots["forbidden"]):
-            continue
-        budget_fit, outside = compute_budget_fit(row["price"], slots["budget_min"], slots["budget_max"])
-        if hard_budget and outside:
-            continue
-        context_score = compute_context_score(doc_text, slots)
-        matched_keywords = [term for term in query_terms if term in doc_token_sets[idx]]
-        final_score = (
-            0.35 * sim_w2v[idx]
-            + 0.25 * sim_tfidf[idx]
-            + 0.20 * budget_fit
-            + 0.10 * context_score
-            + 0.10 * row["popularity_norm"]
-        )
-        if outside and not hard_budget:
-            final_score -= 0.03
-        records.append(
-            {
-                **row.to_dict(),
-                "doc_index": idx,
-                "score": float(final_score),
-                "sim_w2v": float(sim_w2v[idx]),
-                "sim_tfidf": float(sim_tfidf[idx]),
-                "budget_fit": float(budget_fit),
-                "budget_outside": outside,
-                "context_score": float(context_score),
-                "matched_keywords": matched_keywords,
-                "query_terms": query_terms,
-            }
-        )
-    if not records:
-        return pd.DataFrame()
-    return pd.DataFrame(records).sort_values("score", ascending=False).reset_index(drop=True)
+    query_tfidf = vectors["query_vectorizer"].transform(joined)
+    query_embedding = tfidf_weighted_embedding(
+        query_tfidf, vectors["feature_vectors"], vectors["feature_in_vocab"]
+    )
+    sim_tfidf, lexical = lexical_scores(query_tfidf, vectors, lexical_top_k, lexical_engine, joined)
+    sim_w2v, candidates = semantic_scores(query_embedding, vectors, sim_tfidf, lexical, ann_top_m, ann_nprobe)
+
+    # 후보 전체를 배열로 한 번에 계산한다. 금기·하드 예산은 불리언 마스크로 거르고,
+    # 맥락 점수는 상품별 슬롯 비트셋, 인기도 항은 미리 계산한 정적 사전 점수를 쓴다.
+    rows = np.arange(len(catalog)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+    slot_bits = vectors["slot_bits"]
+    if slots["forbidden"]:
+        rows = rows[~forbidden_mask(slot_bits, slots["forbidden"], rows)]
+    budget_fit, outside = budget_fit_scores(catalog.price[rows], slots["budget_min"], slots["budget_max"])
+    if hard_budget:
+        inside = ~outside
+        rows, budget_fit, outside = rows[inside], budget_fit[inside], outside[inside]
+    context = context_scores(slot_bits, slots, rows, catalog.text)
+    prior = vectors.get("static_prior")
+    if prior is None:
+        prior = static_prior(catalog)
+    final = (
+        W2V_WEIGHT * sim_w2v[rows]
+        + LEXICAL_WEIGHT * sim_tfidf[rows]
+        + BUDGET_WEIGHT * budget_fit
+        + CONTEXT_WEIGHT * context
+        + prior[rows]
+    )
+    if not hard_budget:
+        final = np.where(outside, final - BUDGET_OUTSIDE_PENALTY, final)
+    if not len(rows):
+        return ScoredItems.empty_result(query_terms)
 
+    # 상위 상품만 골라(product_id 중복 제거 포함) 배열로 돌려준다.
+    top = _top_unique(final, catalog.product_id[rows], SCORE_POOL if top_n is None else top_n)
+    doc_index = rows[top]
+    return ScoredItems(
+        doc_index,
+        final[top].astype(np.float64),
+        sim_w2v[doc_index].astype(np.float64),
+        sim_tfidf[doc_index].astype(np.float64),
+        budget_fit[top],
+        outside[top],
+        context[top],
+        query_terms,
+    )
 
-def deduplicate_products(items: pd.DataFrame) -> pd.DataFrame:
+
+def _top_unique(scores: np.ndarray, product_ids: np.ndarray, n: int) -> np.ndarray:
     """
-    product_id 기준으로 중복을 제거한다.
-    점수가 높은 순으로 정렬 후 첫 항목만 남긴다.
+    점수 상위 n개 위치를 점수 내림차순(동점은 위치 순)으로 돌려준다. product_id가 같은 행은
+    점수가 가장 높은 하나만 남긴다(n이 0이면 전부).
+
+    argpartition으로 상위 일부만 정렬하고, 중복 제거 후 n개가 안 되면 범위를 두 배로 넓힌다.
     """
-    if items.empty or "product_id" not in items:
-        return items
-    return (
-        items.sort_values("score", ascending=False)
-        .drop_duplicates(subset=["product_id"], keep="first")
-        .reset_index(drop=True)
-    )
+    total = len(scores)
+    take = total if n <= 0 else min(n, total)
+    while True:
+        if take < total:
+            part = np.sort(np.argpartition(-scores, take - 1)[:take])
+        else:
+            part = np.arange(total)
+        order = part[np.argsort(-scores[part], kind="stable")]
+        _, first = np.unique(product_ids[order], return_index=True)
+        order = order[np.sort(first)]
+        if n <= 0 or len(order) >= n or take >= total:
+            return order if n <= 0 else order[:n]
+        take = min(total, take * 2)
 
 
-def format_reason(row: pd.Series, slots: Dict) -> str:
-    """추천 사유(매칭 키워드, 예산 적합, 평점/인기, 금기 충족)를 문자열로 만든다."""
-    matched = row.get("matched_keywords", [])
+def _reason(
+    idx: int, matched: List[str], outside: bool, budget_fit: float, catalog, slots: Dict, fragments=None
+) -> str:
     keyword_text = "/".join(matched[:3]) if matched else "취향 탐색"
-    budget_band = max(1, int(round(row["price"] / 10000)))
-    budget_desc = f"{budget_band}만 원대 예산"
-    if not row.get("budget_outside") and row.get("budget_fit", 0) >= 0.6:
+    if fragments is not None:
+        budget_desc, stats_text = fragments.budget_band(idx), fragments.stats(idx)
+    else:
+        budget_desc = format_budget_band(catalog.price[idx])
+        stats_text = format_stats(catalog.rating[idx], catalog.popularity[idx])
+    if not outside and budget_fit >= 0.6:
         budget_desc += " 적합"
     else:
         budget_desc += " 보완"
-    rating_text = f"평점 {row['rating']:.1f}"
-    popularity = row.get("popularity", 0)
-    pop_text = f"인기 {int(popularity/1000)}k" if popularity >= 1000 else f"인기 {popularity}"
-    guard = describe_guard(row["text"], slots.get("forbidden", set()))
-    pieces = [f"{keyword_text} 키워드 매칭", budget_desc, f"{rating_text}·{pop_text}"]
+    guard = describe_guard(catalog.text(idx), slots.get("forbidden", set()))
+    pieces = [f"{keyword_text} 키워드 매칭", budget_desc, stats_text]
     if guard:
         pieces.append(guard)
     return ", ".join(pieces)
 
 
-def render_table(results: pd.DataFrame):
+def format_reasons(results: pd.DataFrame, catalog, slots: Dict, fragments=None) -> List[str]:
+    """
+    최종 결과 행마다 추천 사유(매칭 키워드, 예산 적합, 평점/인기, 금기 충족)를 만든다.
+
+    행 Series를 만들지 않고 컬럼을 함께 순회하며, fragments(ProductFragments)가 있으면
+    예산대·평점/인기 문구를 미리 만든 것에서 꺼낸다.
+    """
+    return [
+        _reason(idx, matched, outside, fit, catalog, slots, fragments)
+        for idx, matched, outside, fit in zip(
+            results["doc_index"].tolist(),
+            results["matched_keywords"].tolist(),
+            results["budget_outside"].tolist(),
+            results["budget_fit"].tolist(),
+        )
+    ]
+
+
+def render_table(results: pd.DataFrame, catalog):
     """Top-K 추천 결과를 표 형태로 출력한다."""
     if results.empty:
         print("추천 가능한 상품이 없습니다.")
@@ -129,17 +329,20 @@ def render_table(results: pd.DataFrame):
     print(header)
     print("-" * len(header))
     for idx, row in results.iterrows():
-        title = (row["title"][:27] + "...") if len(row["title"]) > 30 else row["title"]
+        doc_idx = int(row["doc_index"])
+        title = catalog.title(doc_idx)
+        title = (title[:27] + "...") if len(title) > 30 else title
+        price = int(catalog.price[doc_idx])
         print(
-            f"{idx+1:<4} {row['product_id']:<8} {title:<30} {row['price']:>8,} {row['score']:>6.3f}  {row['reason']}"
+            f"{idx+1:<4} {row['product_id']:<8} {title:<30} {price:>8,} {row['score']:>6.3f}  {row['reason']}"
         )
 
 
-def summarize_guards(results: pd.DataFrame, slots: Dict):
+def summarize_guards(results: pd.DataFrame, catalog, slots: Dict):
     """금기 위반 건수와 예산 이탈률을 집계해 요약 문장을 출력한다."""
     forbidden_hits = 0
-    for row in results.itertuples():
-        if violates_forbidden(getattr(row, "text"), slots.get("forbidden", set())):
+    for doc_idx in results.get("doc_index", []):
+        if violates_forbidden(catalog.text(int(doc_idx)), slots.get("forbidden", set())):
             forbidden_hits += 1
     budget_out = int(results["budget_outside"].sum()) if not results.empty else 0
     total = len(results) or 1
@@ -1,49 +1,77 @@
-"""MMR(Maximal Marginal Relevance) 기반 다양화 로직."""
+"""
+MMR(Maximal Marginal Relevance) 기반 다양화 로직.
+
+- 관련성 상위 M개(기본 RECO_MMR_POOL_FACTOR × K)만 후보 풀로 남긴다.
+- 풀 안에서 "이미 고른 항목과의 최대 유사도" 벡터를 유지하고, 하나를 고를 때마다
+  행렬-벡터 곱 한 번으로 갱신하므로 전체 비용은 O(K·M·d)다.
+- 고른 항목은 불리언 마스크로 제외한다(목록 삭제·재인덱싱 없음).
+"""
 
 from __future__ import annotations
 
-import math
-from typing import List
+import os
+from typing import Optional
 
 import numpy as np
-import pandas as pd
-
-
-def mmr(items_df: pd.DataFrame, doc_embeddings: np.ndarray, lam: float = 0.7, K: int = 12) -> pd.DataFrame:
-    """관련성과 중복 패널티를 균형 있게 반영해 다양한 후보를 고른다."""
-    if items_df.empty:
-        return items_df
-    # pandas 인덱싱 반복 대신 넘파이 배열로 변환해 루프 비용을 줄인다.
-    scores = items_df["score"].to_numpy()
-    doc_idx = items_df["doc_index"].to_numpy()
-    emb = doc_embeddings[doc_idx]
-    norms = np.linalg.norm(emb, axis=1, keepdims=True)
-    norms[norms == 0] = 1e-8
-    emb_norm = emb / norms
-
-    candidates: List[int] = list(range(len(items_df)))
-    selected: List[int] = []
-
-    while candidates and len(selected) < min(K, len(items_df)):
-        if not selected:
-            # 첫 선택: relevance만으로 결정
-            best_idx = max(candidates, key=lambda idx: scores[idx])
-            selected.append(best_idx)
-            candidates.remove(best_idx)
-            continue
-
-        # 선택된 임베딩과의 최대 유사도를 벡터화 계산
-        selected_emb = emb_norm[selected]  # shape: (len(selected), dim)
-        cand_array = np.array(candidates, dtype=int)
-        cand_emb = emb_norm[cand_array]  # shape: (len(candidates), dim)
-        sims = cand_emb @ selected_emb.T  # (cand, selected)
-        penalty = sims.max(axis=1)
-        relevance = scores[cand_array]
-        mmr_scores = lam * relevance - (1 - lam) * penalty
-
-        best_pos = int(np.argmax(mmr_scores))
-        best_idx = int(cand_array[best_pos])
-        selected.append(best_idx)
-        candidates.remove(best_idx)
-
-    return items_df.loc[selected].reset_index(drop=True)
+
+# 관련성 가중치 λ(1이면 관련성만, 0이면 다양성만)
+MMR_LAMBDA = float(os.getenv("RECO_MMR_LAMBDA", "0.7"))
+# 후보 풀 크기 M = 배수 × K (mmr_pool로 요청별 지정 가능, 0이면 후보 전부)
+MMR_POOL_FACTOR = int(os.getenv("RECO_MMR_POOL_FACTOR", "5"))
+
+
+def mmr_pool_size(K: int, pool: Optional[int] = None) -> int:
+    """MMR 후보 풀 크기(0이면 제한 없음). 풀이 K보다 작으면 K로 맞춘다."""
+    size = MMR_POOL_FACTOR * K if pool is None else int(pool)
+    if size < 0:
+        raise ValueError(f"MMR 후보 풀 크기는 0 이상이어야 합니다: {pool}")
+    return max(size, K) if size else 0
+
+
+def mmr_select(
+    scores: np.ndarray,
+    doc_index: np.ndarray,
+    doc_embeddings,
+    lam: Optional[float] = None,
+    K: int = 12,
+    pool: Optional[int] = None,
+) -> np.ndarray:
+    """
+    관련성과 중복 패널티를 균형 있게 반영해 다양한 후보를 고르고, 고른 위치(입력 배열 기준)를 돌려준다.
+
+    doc_embeddings는 행 단위로 정규화된 행렬(vectors["doc_embeddings"])이라 내적이 곧 코사인이다.
+    압축 저장(QuantizedEmbeddings)이어도 풀에 든 행만 float32로 복원해 쓴다.
+    lam이 None이면 RECO_MMR_LAMBDA, pool이 None이면 RECO_MMR_POOL_FACTOR × K를 쓴다.
+    """
+    lam = MMR_LAMBDA if lam is None else float(lam)
+    if not 0.0 <= lam <= 1.0:
+        raise ValueError(f"MMR λ는 0과 1 사이여야 합니다: {lam}")
+    scores = np.asarray(scores, dtype=np.float64)
+    n_pick = min(K, len(scores))
+    if n_pick <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # 관련성 상위 M개만 남기되, 동점 처리(앞선 위치 우선)를 위해 위치 순서를 유지한다.
+    size = mmr_pool_size(K, pool)
+    if size and size < len(scores):
+        candidates = np.sort(np.argpartition(-scores, size - 1)[:size])
+    else:
+        candidates = np.arange(len(scores))
+    relevance = scores[candidates]
+    emb = np.asarray(doc_embeddings[np.asarray(doc_index)[candidates]], dtype=np.float32)
+
+    available = np.ones(len(candidates), dtype=bool)
+    max_sim = np.full(len(candidates), -np.inf)
+    selected = np.empty(n_pick, dtype=np.int64)
+    # 첫 선택: relevance만으로 결정
+    best = int(np.argmax(relevance))
+    for step in range(n_pick):
+        if step:
+            mmr_scores = lam * relevance - (1 - lam) * max_sim
+            mmr_scores[~available] = -np.inf
+            best = int(np.argmax(mmr_scores))
+        selected[step] = best
+        available[best] = False
+        max_sim = np.maximum(max_sim, emb @ emb[best])
+    return candidates[selected]
+
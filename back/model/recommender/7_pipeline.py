@@ -3,35 +3,60 @@
 from __future__ import annotations
 
 import importlib
-from typing import Dict, Tuple
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+_catalog_module = importlib.import_module("catalog_store")
+CatalogStore = _catalog_module.CatalogStore
+
 _sample_module = importlib.import_module("1_sample_data")
+list_part_files = _sample_module.list_part_files
+load_parts = _sample_module.load_parts
+resolve_data_path = _sample_module.resolve_data_path
 sample_data = _sample_module.sample_data
 
 _text_utils = importlib.import_module("2_text_processing")
 enrich_dataframe = _text_utils.enrich_dataframe
+flatten_text = _text_utils.flatten_text
+normalize_texts = _text_utils.normalize_texts
+normalize_popularity = _text_utils.normalize_popularity
+nouns_available = _text_utils.nouns_available
 tokenize = _text_utils.tokenize
 
+_ann_module = importlib.import_module("ann_index")
+ann_params = _ann_module.ann_params
+
+EMBEDDING_DTYPE = importlib.import_module("embedding_store").EMBEDDING_DTYPE
+
 _modeling = importlib.import_module("3_modeling")
 build_item_vectors = _modeling.build_item_vectors
+extend_item_vectors = _modeling.extend_item_vectors
+bm25_params = _modeling.bm25_params
 build_tfidf = _modeling.build_tfidf
+load_word2vec_artifact = _modeling.load_word2vec_artifact
+load_word2vec_neighbors = _modeling.load_word2vec_neighbors
 train_word2vec = _modeling.train_word2vec
 
 _slot_helpers = importlib.import_module("4_slots_filters")
 expand_keywords = _slot_helpers.expand_keywords
+SLOT_DICTIONARY_DIGEST = _slot_helpers.SLOT_DICTIONARY_DIGEST
 extract_slots = _slot_helpers.extract_slots
 
 _scoring = importlib.import_module("5_scoring")
-format_reason = _scoring.format_reason
+format_reasons = _scoring.format_reasons
 render_table = _scoring.render_table
 score_items = _scoring.score_items
+static_prior = _scoring.static_prior
 summarize_guards = _scoring.summarize_guards
-deduplicate_products = _scoring.deduplicate_products
 
 _mmr_module = importlib.import_module("6_mmr")
-mmr = _mmr_module.mmr
+mmr_select = _mmr_module.mmr_select
+mmr_pool_size = _mmr_module.mmr_pool_size
 
 
 def _log(message: str):
@@ -46,75 +71,189 @@ SAMPLE_QUERIES = [
 ]
 
 
-def prepare_environment() -> Tuple[pd.DataFrame, Dict]:
+# 상품 카탈로그에도 Okt 명사 추출을 적용할지 여부(RECO_CATALOG_NOUNS=0/1).
+# 다중 프로세스 추출 + 텍스트 해시 캐시로 비용을 줄였으므로 konlpy가 있으면 기본으로 켠다.
+CATALOG_USE_NOUNS = bool(int(os.getenv("RECO_CATALOG_NOUNS", "1" if nouns_available() else "0")))
+
+
+class CatalogSentences:
+    """
+    카탈로그를 파트 단위로 읽어 상품 문장을 흘려보내는 재시작 가능한 W2V 코퍼스.
+
+    문장은 정규화된 상품 텍스트의 공백 토큰이라 TF-IDF 어휘와 같은 단위다.
+    한 번에 한 파트만 메모리에 올리며, 순회할 때마다 처음부터 다시 읽는다.
+    """
+
+    def __init__(self, data_dir: Union[str, Path, None] = None, min_length: int = 2):
+        self.source = resolve_data_path(data_dir)
+        self.min_length = min_length
+
+    def files(self) -> List[Path]:
+        return [self.source] if self.source.is_file() else list_part_files(self.source)
+
+    def _frames(self):
+        if self.source.is_file():
+            yield sample_data(self.source)
+            return
+        for part in list_part_files(self.source):
+            yield load_parts([part], workers=1)
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for frame in self._frames():
+            if not len(frame):
+                continue
+            texts = normalize_texts(
+                [flatten_text(values) for values in zip(frame["title"], frame["tags"], frame["category_path"])]
+            )
+            for text in texts:
+                tokens = text.split()
+                if len(tokens) >= self.min_length:
+                    yield tokens
+
+
+@lru_cache(maxsize=1)
+def get_word2vec():
+    """사전 학습 W2V 아티팩트를 프로세스당 한 번 mmap으로 열어 (KeyedVectors, 식별 정보)를 반환한다."""
+    return load_word2vec_artifact()
+
+
+@lru_cache(maxsize=1)
+def get_word2vec_neighbors():
+    """get_word2vec 아티팩트의 상위 N 이웃 표(없으면 None, 질의 확장은 most_similar)."""
+    return load_word2vec_neighbors(*get_word2vec())
+
+
+def environment_params() -> Dict:
+    """환경 빌드 결과에 영향을 주는 설정값(인덱스 아티팩트 지문에 포함)."""
+    return {
+        "catalog_use_nouns": CATALOG_USE_NOUNS,
+        "w2v": get_word2vec()[1],
+        "ann": ann_params(),
+        "embedding_dtype": EMBEDDING_DTYPE,
+        "bm25": bm25_params(),
+        "slot_dictionaries": SLOT_DICTIONARY_DIGEST,
+    }
+
+
+def prepare_environment(data_dir: Union[str, Path, None] = None) -> Tuple[CatalogStore, Dict]:
     """샘플 데이터를 불러와 전처리·임베딩·TF-IDF 모델을 준비한다."""
     _log("샘플 데이터 로드 및 전처리 시작")
-    # 상품 카탈로그는 규칙 기반 토큰화만 적용해 전처리 속도를 높인다.
-    df = enrich_dataframe(sample_data(), use_nouns=False)
-    _log(f"데이터 로드 완료: {len(df)}개 상품")
+    df = enrich_dataframe(sample_data(data_dir), use_nouns=CATALOG_USE_NOUNS)
+    # 행 단위 리스트/문자열 객체를 컬럼형 배열로 압축하고 원본 프레임은 버린다.
+    catalog = CatalogStore.from_frame(df)
+    del df
+    _log(f"데이터 로드 완료: {len(catalog)}개 상품")
 
-    # Word2Vec 추가 학습은 현재 건너뛴다.
-    # w2v = train_word2vec(df["tokens"].tolist())
-    w2v = None
-    _log("Word2Vec 학습 건너뜀")
+    # 기동 시 학습하지 않고 tools/retrain_word2vec.py가 만든 아티팩트를 불러온다.
+    # w2v = train_word2vec(list(catalog.iter_tokens()))
+    w2v, w2v_identity = get_word2vec()
+    if w2v is None:
+        _log("Word2Vec 아티팩트 없음: 의미 유사도 없이 진행")
+    else:
+        _log(f"Word2Vec 아티팩트 로드: {w2v_identity['name']} (어휘 {len(w2v)}개)")
 
     _log("TF-IDF 벡터라이저 학습 중")
-    vectorizer, tfidf_matrix = build_tfidf(df["text"].tolist())
+    vectorizer, tfidf_matrix = build_tfidf(list(catalog.texts()))
     _log("TF-IDF 학습 완료")
 
     _log("상품 임베딩 캐시 구성 중")
-    vectors = build_item_vectors(df, w2v, vectorizer, tfidf_matrix)
+    vectors = build_item_vectors(catalog, w2v, vectorizer, tfidf_matrix, get_word2vec_neighbors())
+    vectors["static_prior"] = static_prior(catalog)
     _log("환경 준비 완료")
-    return df, vectors
+    return catalog, vectors
+
+
+def update_environment(
+    catalog: CatalogStore,
+    vectors: Dict,
+    data_dir: Union[str, Path],
+    changed_parts: Sequence[str],
+    removed_parts: Sequence[str] = (),
+) -> Tuple[CatalogStore, Dict]:
+    """
+    추가/변경된 파트만 다시 읽어 기존 환경에 반영한 새 (catalog, vectors)를 만든다.
+
+    변경·삭제된 파트에서 온 기존 행은 빼고, 변경된 파트의 상품만 토큰화·벡터화해 덧붙인다.
+    TF-IDF 어휘와 IDF는 그대로 두며, 인기도 정규화만 전체 기준으로 다시 계산한다.
+    """
+    stale = catalog.rows_from_sources([*changed_parts, *removed_parts])
+    keep = np.flatnonzero(~stale)
+    frame = load_parts([Path(data_dir) / name for name in changed_parts])
+    _log(f"증분 반영: 파트 {len(changed_parts)}개 → {len(frame)}개 상품, 제외 {int(stale.sum())}개")
+
+    added = CatalogStore.from_frame(enrich_dataframe(frame, use_nouns=CATALOG_USE_NOUNS))
+    updated = catalog.take(keep)
+    if len(added):
+        updated = updated.concat(added)
+    updated.popularity_norm = normalize_popularity(updated.popularity)
+    extended = extend_item_vectors(vectors, keep, added)
+    extended["static_prior"] = static_prior(updated)
+    return updated, extended
 
 
 def run_query(
     query: str,
-    df: pd.DataFrame,
+    catalog: CatalogStore,
     vectors: Dict,
     hard_budget: bool,
     k: int,
+    lexical_engine: Optional[str] = None,
+    mmr_lambda: Optional[float] = None,
+    mmr_pool: Optional[int] = None,
 ) -> Tuple[pd.DataFrame, Dict]:
-    """단일 질의를 실행해 슬롯 추출→확장→스코어링→MMR→사유 생성을 수행한다."""
+    """
+    단일 질의를 실행해 슬롯 추출→확장→스코어링→MMR→사유 생성을 수행한다.
+
+    lexical_engine은 어휘 점수 엔진(tfidf/bm25, None이면 RECO_LEXICAL_ENGINE)이다.
+    mmr_lambda는 MMR 관련성 가중치(None이면 RECO_MMR_LAMBDA), mmr_pool은 MMR 후보 풀 크기
+    M(None이면 RECO_MMR_POOL_FACTOR × k, 0이면 RECO_SCORE_POOL개 후보)이다.
+    """
     _log(f"질의 처리 시작: {query}")
     slots = extract_slots(query)
     if not slots["core_keywords"]:
         slots["core_keywords"] = tokenize(query)[:4]
     _log(f"슬롯 추출 완료: core={slots['core_keywords']}, forbidden={slots['forbidden']}")
-    expanded = expand_keywords(slots["core_keywords"], vectors["w2v"], slots["forbidden"])
+    expanded = expand_keywords(
+        slots["core_keywords"], vectors["w2v"], slots["forbidden"], vectors.get("w2v_neighbors")
+    )
     query_terms = list(dict.fromkeys(expanded))
     _log(f"키워드 확장 완료 ({len(query_terms)}개): {query_terms}")
-    scored = score_items(query_terms, query, df, vectors, slots, hard_budget)
+    # score_items가 product_id 중복을 제거한 상위 M개(MMR 후보 풀)만 돌려준다.
+    # 풀 제한이 없으면(0) score_items 기본값(RECO_SCORE_POOL)까지 받는다.
+    pool = mmr_pool_size(k, mmr_pool)
+    scored = score_items(
+        query_terms, query, catalog, vectors, slots, hard_budget, lexical_engine=lexical_engine, top_n=pool or None
+    )
     _log(f"스코어링 완료: {len(scored)}개 후보")
 
-    # product_id 기준 중복 제거 후 Top-K MMR
-    deduped = deduplicate_products(scored)
-    _log(f"중복 제거 완료: {len(deduped)}개 후보")
-    selected = mmr(deduped, vectors["doc_embeddings"], K=k).copy()
+    # 후보가 이미 풀 크기로 잘려 있으므로 MMR은 다시 자르지 않는다(pool=0).
+    # MMR은 후보 배열 위에서 위치만 고르고, 행·사유는 고른 K개에 대해서만 만든다.
+    picked = mmr_select(scored.score, scored.doc_index, vectors["doc_embeddings"], lam=mmr_lambda, K=k, pool=0)
+    selected = scored.to_frame(catalog, picked)
     _log(f"MMR 선택 완료: {len(selected)}개 Top-K")
     if not selected.empty:
-        selected["reason"] = selected.apply(lambda row: format_reason(row, slots), axis=1)
+        selected["reason"] = format_reasons(selected, catalog, slots, vectors.get("fragments"))
     summary = {"slots": slots, "results": selected}
     _log("질의 처리 종료")
     return selected, summary
 
 
-def display_results(results: pd.DataFrame, slots: Dict):
+def display_results(results: pd.DataFrame, catalog: CatalogStore, slots: Dict):
     """추천 표와 품질 가드 요약을 함께 출력한다."""
-    render_table(results)
-    summarize_guards(results, slots)
+    render_table(results, catalog)
+    summarize_guards(results, catalog, slots)
 
 
-def run_samples(df: pd.DataFrame, vectors: Dict, hard_budget: bool, k: int):
+def run_samples(catalog: CatalogStore, vectors: Dict, hard_budget: bool, k: int):
     """사전에 정의된 샘플 질의 3개를 자동으로 실행한다."""
     print("\n=== Auto Sample Queries ===")
     for idx, query in enumerate(SAMPLE_QUERIES, start=1):
         print(f"\n[SAMPLE {idx}] {query}")
         results, summary = run_query(
             query=query,
-            df=df,
+            catalog=catalog,
             vectors=vectors,
             hard_budget=hard_budget,
             k=min(k, 8),
         )
-        display_results(results, summary["slots"])
+        display_results(results, catalog, summary["slots"])
@@ -1 +1,9 @@
-from .adapter import run_recommender, warm_recommender_env_async, ensure_recommender_env  # noqa: F401
+from .adapter import (  # noqa: F401
+    build_recommender_index,
+    ensure_recommender_env,
+    refresh_recommender_env,
+    run_recommender,
+    start_catalog_watcher,
+    stop_catalog_watcher,
+    warm_recommender_env_async,
+)
@@ -2,27 +2,41 @@
 ``back/model/recommender`` 아래 추천 파이프라인을 감싸는 어댑터.
 
 - 파이프라인 모듈(1_sample_data ~ 7_pipeline) 로드
-- 환경(df, vectors) 준비 및 캐싱
+- 환경(catalog, vectors) 준비 및 캐싱(인덱스 아티팩트 우선 로드, 지문 불일치 시 재빌드)
+- 새/변경 파트 증분 반영과 선택적 디렉터리 감시 스레드
 - run_recommender와 비동기 워밍업 헬퍼 제공
 """
 
 from __future__ import annotations
 
 import importlib
+import os
 import sys
-from numbers import Number
 from pathlib import Path
-from threading import Lock, Thread
+from threading import Event, Lock, Thread
 from typing import Any, Dict, Optional
 
 RECOMMENDER_DIR = Path(__file__).resolve().parent
 if str(RECOMMENDER_DIR) not in sys.path:
     sys.path.insert(0, str(RECOMMENDER_DIR))
 
+_catalog_module = importlib.import_module("catalog_store")
+format_cost = _catalog_module.format_cost
+format_tags = _catalog_module.format_tags
+
+# RECO_INDEX_CACHE=0이면 아티팩트를 쓰지 않고 매 기동마다 환경을 새로 만든다.
+USE_INDEX_ARTIFACT = bool(int(os.getenv("RECO_INDEX_CACHE", "1")))
+# RECO_WATCH_INTERVAL(초)이 0보다 크면 워밍업 후 카탈로그 디렉터리 감시 스레드를 띄운다.
+WATCH_INTERVAL = float(os.getenv("RECO_WATCH_INTERVAL", "0"))
+
 _reco_pipeline = None
-_reco_env_cache: Dict[str, Any] = {"df": None, "vectors": None}
+_reco_index_store = None
+_reco_env_cache: Dict[str, Any] = {"catalog": None, "vectors": None}
 _reco_env_lock = Lock()
+_reco_refresh_lock = Lock()
 _reco_warmup_started = False
+_reco_watcher: Optional[Thread] = None
+_reco_watcher_stop = Event()
 
 
 def _get_recommender_pipeline():
@@ -33,14 +47,88 @@ def _get_recommender_pipeline():
     return _reco_pipeline
 
 
+def _get_index_store():
+    global _reco_index_store
+    if _reco_index_store is not None:
+        return _reco_index_store
+    _reco_index_store = importlib.import_module("index_store")
+    return _reco_index_store
+
+
+def build_recommender_index(
+    data_dir: Optional[str] = None,
+    index_dir: Optional[str] = None,
+    force: bool = False,
+    logger=None,
+) -> Dict[str, Any]:
+    """
+    입력 지문이 맞는 인덱스 아티팩트가 있으면 로드하고, 없으면 환경을 빌드해 저장한다.
+
+    force=True이면 기존 아티팩트를 무시하고 항상 새로 빌드한다.
+    저장에 실패해도 빌드한 환경은 반환하며, 이때 ``index_version``은 None이다.
+    """
+    pipeline = _get_recommender_pipeline()
+    store = _get_index_store()
+    source = importlib.import_module("1_sample_data").resolve_data_path(data_dir)
+    params = pipeline.environment_params()
+    if not force:
+        loaded = store.load_index(
+            source,
+            params,
+            root=index_dir,
+            w2v=pipeline.get_word2vec()[0],
+            w2v_neighbors=pipeline.get_word2vec_neighbors(),
+        )
+        if loaded is not None:
+            catalog, vectors, manifest = loaded
+            if logger:
+                logger.info("[recommender] 인덱스 아티팩트 로드: %s (%s개 상품)", manifest["version"], len(catalog))
+            return _make_env(catalog, vectors, source, manifest["sources"], manifest["version"], index_dir)
+
+    # 빌드 전에 지문을 떠 두면, 빌드 중 바뀐 파일은 다음 기동에서 불일치로 감지된다.
+    sources = store.scan_sources(source)
+    catalog, vectors = pipeline.prepare_environment(source)
+    index_version = _save_index(catalog, vectors, sources, index_dir, logger)
+    return _make_env(catalog, vectors, source, sources, index_version, index_dir)
+
+
+def _make_env(catalog, vectors, source, sources, index_version, index_dir) -> Dict[str, Any]:
+    # 키워드 행렬은 환경을 만들 때(빌드·로드·갱신 교체 전) 만들어 두어 첫 질의가 빌드 비용을 내지 않게 한다.
+    catalog.keyword_matrix()
+    return {
+        "catalog": catalog,
+        "vectors": vectors,
+        "source": source,
+        "sources": sources,
+        "index_version": index_version,
+        "index_dir": index_dir,
+    }
+
+
+def _save_index(catalog, vectors, sources, index_dir, logger) -> Optional[str]:
+    """아티팩트를 저장하고 버전명을 반환한다. 실패하면 경고만 남기고 None."""
+    params = _get_recommender_pipeline().environment_params()
+    try:
+        index_version = _get_index_store().save_index(catalog, vectors, sources, params, root=index_dir).name
+    except OSError as exc:
+        if logger:
+            logger.warning("[recommender] 인덱스 아티팩트 저장 실패: %s", exc)
+        return None
+    if logger:
+        logger.info("[recommender] 인덱스 아티팩트 저장: %s", index_version)
+    return index_version
+
+
 def ensure_recommender_env(force_reload: bool = False, logger=None) -> Dict[str, Any]:
     """
-    추천 파이프라인 실행에 필요한 df와 vectors를 준비하고 캐싱한다.
+    추천 파이프라인 실행에 필요한 catalog와 vectors를 준비하고 캐싱한다.
+
+    인덱스 아티팩트의 지문이 현재 카탈로그와 같으면 재빌드 없이 바로 로드한다.
     """
     global _reco_env_cache
     if (
         not force_reload
-        and _reco_env_cache.get("df") is not None
+        and _reco_env_cache.get("catalog") is not None
         and _reco_env_cache.get("vectors") is not None
     ):
         return _reco_env_cache
@@ -48,16 +136,21 @@ def ensure_recommender_env(force_reload: bool = False, logger=None) -> Dict[str,
     with _reco_env_lock:
         if (
             not force_reload
-            and _reco_env_cache.get("df") is not None
+            and _reco_env_cache.get("catalog") is not None
             and _reco_env_cache.get("vectors") is not None
         ):
             return _reco_env_cache
 
-        pipeline = _get_recommender_pipeline()
-        df, vectors = pipeline.prepare_environment()
-        _reco_env_cache = {"df": df, "vectors": vectors}
+        if USE_INDEX_ARTIFACT:
+            env = build_recommender_index(logger=logger)
+        else:
+            source = importlib.import_module("1_sample_data").resolve_data_path()
+            sources = _get_index_store().scan_sources(source)
+            catalog, vectors = _get_recommender_pipeline().prepare_environment(source)
+            env = _make_env(catalog, vectors, source, sources, None, None)
+        _reco_env_cache = env
         if logger:
-            logger.info("[recommender] 환경 준비 완료: %s개 상품", len(df))
+            logger.info("[recommender] 환경 준비 완료: %s개 상품", len(env["catalog"]))
         return _reco_env_cache
 
 
@@ -72,20 +165,102 @@ def warm_recommender_env_async(logger=None) -> None:
         _reco_warmup_started = True
 
     def _target():
+        # 환경 빌드와 별개로 질의 명사 추출용 Okt(JVM)도 미리 띄운다.
+        importlib.import_module("2_text_processing").warm_okt_async()
         try:
             ensure_recommender_env(logger=logger)
         except Exception as exc:  # pragma: no cover - 기동 로깅 용
             if logger:
                 logger.error("[recommender] 환경 준비 실패: %s", exc, exc_info=True)
+            return
+        start_catalog_watcher(logger=logger)
 
     Thread(target=_target, daemon=True).start()
 
 
+def refresh_recommender_env(logger=None, persist: bool = True) -> bool:
+    """
+    카탈로그 디렉터리의 새/변경/삭제 파트만 증분 반영하고 환경을 원자적으로 교체한다.
+
+    파트 변경은 크기·mtime으로 먼저 거르고 SHA-1로 확정한다. 무거운 작업은
+    ``_reco_env_lock`` 밖에서 수행하므로 반영 중에도 질의는 기존 환경으로 처리된다.
+    변경이 반영되면 True, 변경이 없거나 그 사이 다른 경로로 환경이 교체됐으면 False.
+    """
+    global _reco_env_cache
+    ensure_recommender_env(logger=logger)
+    with _reco_refresh_lock:
+        env = _reco_env_cache
+        source = env.get("source")
+        if source is None or Path(source).is_file():
+            return False
+        store = _get_index_store()
+        previous = env.get("sources") or {}
+        current = store.scan_sources(source, previous=previous)
+        changed = sorted(name for name, entry in current.items() if previous.get(name, {}).get("sha1") != entry["sha1"])
+        removed = sorted(set(previous) - set(current))
+        if not changed and not removed:
+            # 내용은 같고 mtime만 바뀐 파일을 다음 감시 주기에 다시 해시하지 않도록 갱신한다.
+            env["sources"] = current
+            return False
+
+        catalog, vectors = _get_recommender_pipeline().update_environment(
+            env["catalog"], env["vectors"], source, changed, removed
+        )
+        index_version = env.get("index_version")
+        if persist and USE_INDEX_ARTIFACT:
+            index_version = _save_index(catalog, vectors, current, env.get("index_dir"), logger) or index_version
+        new_env = _make_env(catalog, vectors, source, current, index_version, env.get("index_dir"))
+        with _reco_env_lock:
+            if _reco_env_cache is not env:
+                return False
+            _reco_env_cache = new_env
+        if logger:
+            logger.info(
+                "[recommender] 증분 반영 완료: 변경 %s, 삭제 %s → %s개 상품", changed, removed, len(catalog)
+            )
+        return True
+
+
+def _watch_catalog(interval: float, logger=None) -> None:
+    while not _reco_watcher_stop.wait(interval):
+        try:
+            refresh_recommender_env(logger=logger)
+        except Exception as exc:  # pragma: no cover - 백그라운드 로깅 용
+            if logger:
+                logger.error("[recommender] 카탈로그 증분 반영 실패: %s", exc, exc_info=True)
+
+
+def start_catalog_watcher(interval: Optional[float] = None, logger=None) -> bool:
+    """
+    interval초마다 카탈로그 디렉터리를 확인해 증분 반영하는 데몬 스레드를 띄운다.
+
+    interval이 없으면 RECO_WATCH_INTERVAL을 쓰며, 0 이하이면 감시하지 않는다.
+    """
+    global _reco_watcher
+    interval = WATCH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return False
+    with _reco_env_lock:
+        if _reco_watcher is not None and _reco_watcher.is_alive():
+            return False
+        _reco_watcher_stop.clear()
+        _reco_watcher = Thread(target=_watch_catalog, args=(interval, logger), daemon=True)
+        _reco_watcher.start()
+    return True
+
+
+def stop_catalog_watcher() -> None:
+    """감시 스레드에 종료 신호를 보낸다."""
+    _reco_watcher_stop.set()
+
+
 def _serialize_recommender_payload(
     sentence: str,
     results,
+    catalog,
     summary: Dict[str, Any],
     search_log_id: Optional[str],
+    fragments=None,
 ) -> Dict[str, Any]:
     slots_raw = summary.get("slots", {}) if isinstance(summary, dict) else {}
 
@@ -112,31 +287,27 @@ def _serialize_recommender_payload(
     }
 
     items = []
-    for row in results.to_dict(orient="records") if hasattr(results, "to_dict") else []:
-        price_val = row.get("price")
-        cost_text = None
-        if isinstance(price_val, Number) and not isinstance(price_val, bool):
-            cost_text = f"{int(price_val):,}원"
-        tags_val = row.get("tags")
-        if isinstance(tags_val, (list, tuple)):
-            tags_text = ", ".join(str(tag) for tag in tags_val if tag)
-        else:
-            tags_text = str(tags_val) if tags_val else ""
-        items.append(
-            {
-                "id": row.get("product_id"),
-                "name": row.get("title") or "",
-                "image_url": row.get("image") or "",
-                "cost": cost_text,
-                "satisfaction": row.get("rating"),
-                "review_count": row.get("popularity"),
-                "tags": tags_text,
-                "category_path": row.get("category_path"),
-                "link": row.get("link") or "",
-                "reason": row.get("reason"),
-                "score": row.get("score"),
-            }
-        )
+    if results is not None and not results.empty:
+        # 상품 필드는 컬럼형 카탈로그에서 doc_index로 직접 읽고, 가격 문구는 미리 만든 조각을 쓴다.
+        # 태그 문구는 응답하는 K개 행에 대해서만 만든다.
+        for doc_idx, reason, score in zip(
+            results["doc_index"].tolist(), results["reason"].tolist(), results["score"].tolist()
+        ):
+            items.append(
+                {
+                    "id": catalog.product_id[doc_idx].item(),
+                    "name": catalog.title(doc_idx),
+                    "image_url": catalog.image(doc_idx),
+                    "cost": fragments.cost(doc_idx) if fragments else format_cost(catalog.price[doc_idx]),
+                    "satisfaction": float(catalog.rating[doc_idx]),
+                    "review_count": int(catalog.popularity[doc_idx]),
+                    "tags": format_tags(catalog.tags(doc_idx)),
+                    "category_path": catalog.category_path(doc_idx),
+                    "link": catalog.link(doc_idx),
+                    "reason": reason,
+                    "score": score,
+                }
+            )
 
     payload = {
         "query": query_payload,
@@ -155,17 +326,29 @@ def run_recommender(
     hard_budget: bool = False,
     search_log_id: Optional[str] = None,
     logger=None,
+    lexical_engine: Optional[str] = None,
+    mmr_lambda: Optional[float] = None,
+    mmr_pool: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     추천 파이프라인을 실행하고 직렬화된 결과를 반환한다.
+
+    lexical_engine으로 요청별 어휘 점수 엔진("tfidf"/"bm25")을 고를 수 있다(None이면 RECO_LEXICAL_ENGINE).
+    MMR은 top_k개를 고르며, mmr_lambda(관련성 가중치, None이면 RECO_MMR_LAMBDA)와
+    mmr_pool(후보 풀 크기, None이면 RECO_MMR_POOL_FACTOR × top_k, 0이면 RECO_SCORE_POOL개)로 조정한다.
     """
     pipeline = _get_recommender_pipeline()
     env = ensure_recommender_env(logger=logger)
     results, summary = pipeline.run_query(
         query=sentence,
-        df=env["df"],
+        catalog=env["catalog"],
         vectors=env["vectors"],
         hard_budget=hard_budget,
         k=top_k,
+        lexical_engine=lexical_engine,
+        mmr_lambda=mmr_lambda,
+        mmr_pool=mmr_pool,
+    )
+    return _serialize_recommender_payload(
+        sentence, results, env["catalog"], summary, search_log_id, env["vectors"].get("fragments")
     )
-    return _serialize_recommender_payload(sentence, results, summary, search_log_id)
@@ -0,0 +1,181 @@
+"""
+정규화된 문서 임베딩 위의 IVF(역파일) 근사 최근접 이웃 인덱스.
+
+- 구면 k-means로 nlist개 중심을 학습하고, 각 문서를 가장 가까운 중심의 리스트에 넣는다.
+- 검색은 질의와 가까운 중심 nprobe개의 리스트만 정확히 내적해 상위 M개를 고른다.
+- 리스트는 (offsets, ids) CSR 형태라 넘파이 배열 그대로 저장·메모리 매핑할 수 있다.
+
+nprobe를 키우면 재현율이, 줄이면 속도가 올라간다. tools/benchmark_ann_recall.py로 확인한다.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# RECO_ANN: auto(카탈로그가 ANN_MIN_ITEMS 이상이고 W2V가 있을 때) / 1(항상) / 0(끔)
+ANN_MODE = os.getenv("RECO_ANN", "auto").lower()
+ANN_MIN_ITEMS = int(os.getenv("RECO_ANN_MIN_ITEMS", "50000"))
+# 빌드 파라미터: 리스트 수(0=sqrt(N) 자동), k-means 반복 수
+ANN_NLIST = int(os.getenv("RECO_ANN_NLIST", "0"))
+ANN_ITERATIONS = int(os.getenv("RECO_ANN_ITERATIONS", "10"))
+# 검색 파라미터: 탐색할 리스트 수, 반환할 의미 후보 수
+ANN_NPROBE = int(os.getenv("RECO_ANN_NPROBE", "8"))
+ANN_TOP_M = int(os.getenv("RECO_ANN_TOP_M", "2000"))
+
+_ASSIGN_BATCH = 65536
+_TRAIN_POINTS_PER_LIST = 256
+
+
+def ann_params() -> Dict:
+    """인덱스 아티팩트 지문에 들어갈 빌드 파라미터(검색 파라미터는 제외)."""
+    return {"mode": ANN_MODE, "min_items": ANN_MIN_ITEMS, "nlist": ANN_NLIST, "iterations": ANN_ITERATIONS}
+
+
+def should_build(n_items: int, has_embeddings: bool) -> bool:
+    if ANN_MODE in ("0", "off", "false") or not has_embeddings:
+        return False
+    if ANN_MODE in ("1", "on", "true"):
+        return n_items > 0
+    return n_items >= ANN_MIN_ITEMS
+
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """각 행을 내적이 가장 큰 중심에 배정한다(메모리를 위해 배치 단위로 계산)."""
+    labels = np.empty(embeddings.shape[0], dtype=np.int32)
+    for start in range(0, embeddings.shape[0], _ASSIGN_BATCH):
+        block = embeddings[start : start + _ASSIGN_BATCH]
+        labels[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def _spherical_kmeans(points: np.ndarray, n_lists: int, iterations: int, seed: int) -> np.ndarray:
+    """단위 벡터에 대한 구면 k-means. 빈 클러스터는 임의의 점으로 다시 채운다."""
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(points, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(points[order], starts[filled], axis=0)
+        centroids[filled] = sums
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), size=len(empty), replace=False)]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+def _group(labels: np.ndarray, ids: np.ndarray, n_lists: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+    return offsets, np.ascontiguousarray(ids[order], dtype=np.int32)
+
+
+class IVFIndex:
+    """중심 행렬과 리스트별 문서 id(CSR)로 구성된 IVF 인덱스."""
+
+    __slots__ = ("centroids", "offsets", "ids")
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        zero_norm: Optional[np.ndarray] = None,
+        n_lists: Optional[int] = None,
+        iterations: Optional[int] = None,
+        seed: int = 42,
+    ) -> "IVFIndex":
+        """
+        정규화된 임베딩으로 인덱스를 만든다. 노름 0 문서는 어떤 질의와도 유사도가 0이라 넣지 않는다.
+
+        k-means는 리스트당 최대 256개 표본으로 학습하고, 전체 문서는 학습된 중심에 배정한다.
+        """
+        ids = np.arange(embeddings.shape[0], dtype=np.int64)
+        if zero_norm is not None:
+            ids = ids[~np.asarray(zero_norm, dtype=bool)]
+        n_lists = n_lists or ANN_NLIST or max(1, int(math.sqrt(len(ids))))
+        n_lists = max(1, min(n_lists, len(ids)))
+        iterations = ANN_ITERATIONS if iterations is None else iterations
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(ids), n_lists * _TRAIN_POINTS_PER_LIST)
+        sample = np.sort(rng.choice(ids, size=sample_size, replace=False)) if sample_size < len(ids) else ids
+        centroids = _spherical_kmeans(np.asarray(embeddings[sample], dtype=np.float32), n_lists, iterations, seed)
+        labels = _assign(np.asarray(embeddings[ids], dtype=np.float32), centroids)
+        offsets, grouped = _group(labels, ids, n_lists)
+        return cls(centroids, offsets, grouped)
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query_unit: np.ndarray,
+        top_m: Optional[int] = None,
+        n_probe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        질의와 가까운 n_probe개 리스트 안에서 내적 상위 top_m 문서의 (id, 유사도)를 유사도 내림차순으로 돌려준다.
+        """
+        top_m = top_m or ANN_TOP_M
+        n_probe = max(1, min(n_probe or ANN_NPROBE, self.n_lists))
+        centroid_scores = self.centroids @ query_unit
+        if n_probe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            probes = np.arange(self.n_lists)
+        candidates = np.concatenate([self.ids[self.offsets[p] : self.offsets[p + 1]] for p in probes])
+        if not len(candidates):
+            return candidates.astype(np.int64), np.zeros(0, dtype=np.float32)
+        scores = embeddings[candidates] @ query_unit
+        if len(candidates) > top_m:
+            keep = np.argpartition(-scores, top_m - 1)[:top_m]
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return candidates[order].astype(np.int64), scores[order]
+
+    def update(self, keep: np.ndarray, added_embeddings: np.ndarray, added_zero_norm: np.ndarray) -> "IVFIndex":
+        """
+        keep 행만 남기고(새 위치로 번호를 다시 매김) 추가 문서를 기존 중심에 배정한 새 인덱스를 만든다.
+
+        중심은 다시 학습하지 않는다. 분포가 크게 바뀌면 전체 재빌드로 갱신된다.
+        """
+        keep = np.asarray(keep, dtype=np.int64)
+        n_old = int(self.ids.max()) + 1 if len(self.ids) else 0
+        new_pos = np.full(max(n_old, int(keep.max()) + 1 if len(keep) else 0), -1, dtype=np.int64)
+        new_pos[keep] = np.arange(len(keep))
+        lists = np.repeat(np.arange(self.n_lists, dtype=np.int32), np.diff(self.offsets))
+        remapped = new_pos[self.ids]
+        alive = remapped >= 0
+        added_ids = np.flatnonzero(~np.asarray(added_zero_norm, dtype=bool))
+        added_labels = (
+            _assign(np.asarray(added_embeddings, dtype=np.float32)[added_ids], self.centroids)
+            if len(added_ids)
+            else np.zeros(0, dtype=np.int32)
+        )
+        labels = np.concatenate([lists[alive], added_labels])
+        ids = np.concatenate([remapped[alive], added_ids + len(keep)])
+        offsets, grouped = _group(labels, ids, self.n_lists)
+        return IVFIndex(self.centroids, offsets, grouped)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids, "offsets": self.offsets, "ids": self.ids}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "IVFIndex":
+        return cls(arrays["centroids"], arrays["offsets"], arrays["ids"])
@@ -0,0 +1,531 @@
+"""
+상품 카탈로그를 행 단위 파이썬 객체 대신 넘파이 배열로 보관하는 컬럼형 저장소.
+
+- 문자열 컬럼(title/image/text): 하나의 문자열 버퍼 + 오프셋 배열
+- 리스트 컬럼(tags/tokens): 인턴된 문자열 테이블 + 코드 배열 + 오프셋 배열
+- 범주형 컬럼(link/category_path/source): 고유값 테이블 + 행별 int32 코드
+- 수치 컬럼(price/rating/popularity/popularity_norm): 넘파이 배열
+- product_id: 고정폭 유니코드 배열 + 지연 생성되는 id → 행 인덱스 딕셔너리
+- 키워드 매칭: tokens 컬럼 코드로 지연 생성되는 상품 × 토큰 이진 희소 행렬(KeywordMatrix)
+- 응답 조각: 가격/태그/평점·인기/예산대 문구를 미리 만들어 둔 문자열 테이블(ProductFragments)
+
+스코어링/직렬화는 doc_index로 필요한 행만 꺼내 읽는다.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _offsets_from_lengths(lengths: Iterable[int], count: int) -> np.ndarray:
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(lengths, dtype=np.int64, count=count), out=offsets[1:])
+    return offsets
+
+
+def _merge_tables(base: "StringTable", extra: "StringTable"):
+    """두 인턴 테이블을 합치고 extra 코드 → 합친 테이블 코드 매핑 배열을 돌려준다."""
+    index = {value: code for code, value in enumerate(base)}
+    remap = np.fromiter((index.setdefault(value, len(index)) for value in extra), dtype=np.int32, count=len(extra))
+    if len(index) == len(base):
+        return base, remap
+    return StringTable.from_strings(list(index)), remap
+
+
+class StringTable:
+    """문자열 시퀀스를 단일 버퍼와 오프셋으로 저장한다(행마다 str 객체를 두지 않는다)."""
+
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob: str, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values: Sequence[str]) -> "StringTable":
+        values = ["" if v is None else str(v) for v in values]
+        return cls("".join(values), _offsets_from_lengths(map(len, values), len(values)))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        return self.blob[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        blob, offsets = self.blob, self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield blob[start:end]
+
+    def take(self, indices: Sequence[int]) -> "StringTable":
+        return StringTable.from_strings([self[idx] for idx in np.asarray(indices, dtype=np.int64).tolist()])
+
+    def concat(self, other: "StringTable") -> "StringTable":
+        return StringTable(
+            self.blob + other.blob,
+            np.concatenate([self.offsets, np.asarray(other.offsets[1:]) + self.offsets[-1]]),
+        )
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.blob": np.frombuffer(self.blob.encode("utf-8"), dtype=np.uint8),
+            f"{prefix}.offsets": self.offsets,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "StringTable":
+        blob = np.asarray(arrays[f"{prefix}.blob"]).tobytes().decode("utf-8")
+        return cls(blob, np.asarray(arrays[f"{prefix}.offsets"]))
+
+
+class ListColumn:
+    """행별 문자열 리스트를 인턴 테이블 코드 + 오프셋 배열(CSR 형태)로 저장한다."""
+
+    __slots__ = ("offsets", "codes", "vocab")
+
+    def __init__(self, offsets: np.ndarray, codes: np.ndarray, vocab: StringTable):
+        self.offsets = offsets
+        self.codes = codes
+        self.vocab = vocab
+
+    @classmethod
+    def from_lists(cls, rows: Sequence[Sequence[str]]) -> "ListColumn":
+        index: Dict[str, int] = {}
+        codes: List[int] = []
+        lengths: List[int] = []
+        for row in rows:
+            items = list(row) if isinstance(row, (list, tuple, np.ndarray)) else []
+            lengths.append(len(items))
+            for item in items:
+                codes.append(index.setdefault(str(item), len(index)))
+        return cls(
+            _offsets_from_lengths(lengths, len(lengths)),
+            np.asarray(codes, dtype=np.int32),
+            StringTable.from_strings(list(index)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row_codes(self, idx: int) -> np.ndarray:
+        return self.codes[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def __getitem__(self, idx: int) -> List[str]:
+        vocab = self.vocab
+        return [vocab[code] for code in self.row_codes(idx).tolist()]
+
+    def take(self, indices: Sequence[int]) -> "ListColumn":
+        """선택한 행만 남긴다. 코드 배열은 오프셋 기반 gather로 한 번에 모은다."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = _offsets_from_lengths(lengths, len(indices))
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return ListColumn(offsets, self.codes[positions], self.vocab)
+
+    def concat(self, other: "ListColumn") -> "ListColumn":
+        """다른 컬럼을 뒤에 붙이고, 상대 인턴 테이블 코드는 이쪽 테이블로 재매핑한다."""
+        vocab, remap = _merge_tables(self.vocab, other.vocab)
+        return ListColumn(
+            np.concatenate([self.offsets, np.asarray(other.offsets[1:]) + self.offsets[-1]]),
+            np.concatenate([self.codes, remap[other.codes]]).astype(np.int32),
+            vocab,
+        )
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        arrays = {f"{prefix}.offsets": self.offsets, f"{prefix}.codes": self.codes}
+        arrays.update(self.vocab.to_arrays(f"{prefix}.vocab"))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "ListColumn":
+        return cls(
+            np.asarray(arrays[f"{prefix}.offsets"]),
+            np.asarray(arrays[f"{prefix}.codes"]),
+            StringTable.from_arrays(arrays, f"{prefix}.vocab"),
+        )
+
+
+def format_cost(price: int) -> str:
+    return f"{int(price):,}원"
+
+
+def format_tags(tags: Sequence[str]) -> str:
+    return ", ".join(tag for tag in tags if tag)
+
+
+def format_stats(rating: float, popularity: int) -> str:
+    """추천 사유의 "평점 x.x·인기 n" 조각."""
+    popularity = int(popularity)
+    pop_text = f"인기 {int(popularity/1000)}k" if popularity >= 1000 else f"인기 {popularity}"
+    return f"평점 {float(rating):.1f}·{pop_text}"
+
+
+def format_budget_band(price: int) -> str:
+    """추천 사유의 "n만 원대 예산" 조각(만 원 단위 반올림, 최소 1)."""
+    return f"{max(1, int(round(int(price) / 10000)))}만 원대 예산"
+
+
+class ProductFragments:
+    """
+    상품별로 질의와 무관한 짧은 응답 문구(가격·평점/인기·예산대)를 미리 만들어 둔 테이블.
+
+    환경 빌드 때 한 번 만들고, 응답 조립은 최종 K개 행의 문자열을 꺼내 붙이기만 한다.
+    태그 문구는 tags 컬럼을 한 벌 더 두는 셈이라 담지 않고, 응답할 K개 행에서만 format_tags로 만든다.
+    """
+
+    FIELDS = ("cost", "stats", "budget_band")
+    __slots__ = ("tables",)
+
+    def __init__(self, tables: Dict[str, StringTable]):
+        self.tables = tables
+
+    @classmethod
+    def from_catalog(cls, catalog: "CatalogStore") -> "ProductFragments":
+        prices = catalog.price.tolist()
+        values = {
+            "cost": [format_cost(price) for price in prices],
+            "stats": [
+                format_stats(rating, popularity)
+                for rating, popularity in zip(catalog.rating.tolist(), catalog.popularity.tolist())
+            ],
+            "budget_band": [format_budget_band(price) for price in prices],
+        }
+        return cls({name: StringTable.from_strings(values[name]) for name in cls.FIELDS})
+
+    def __len__(self) -> int:
+        return len(self.tables["cost"])
+
+    def cost(self, idx: int) -> str:
+        return self.tables["cost"][idx]
+
+    def stats(self, idx: int) -> str:
+        return self.tables["stats"][idx]
+
+    def budget_band(self, idx: int) -> str:
+        return self.tables["budget_band"][idx]
+
+    def take(self, indices: Sequence[int]) -> "ProductFragments":
+        return ProductFragments({name: table.take(indices) for name, table in self.tables.items()})
+
+    def concat(self, other: "ProductFragments") -> "ProductFragments":
+        return ProductFragments({name: table.concat(other.tables[name]) for name, table in self.tables.items()})
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays: Dict[str, np.ndarray] = {}
+        for name, table in self.tables.items():
+            arrays.update(table.to_arrays(name))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "ProductFragments":
+        return cls({name: StringTable.from_arrays(arrays, name) for name in cls.FIELDS})
+
+
+class KeywordMatrix:
+    """
+    상품 × 토큰 이진 희소 행렬(CSR)과 토큰 → 열 번호 사전.
+
+    tokens 컬럼의 오프셋/코드 배열을 그대로 CSR 버퍼로 쓰므로 상품마다 set을 두지 않는다.
+    """
+
+    __slots__ = ("matrix", "vocabulary")
+
+    def __init__(self, matrix: sparse.csr_matrix, vocabulary: Dict[str, int]):
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_column(cls, column: ListColumn) -> "KeywordMatrix":
+        # 컬럼 배열은 mmap(읽기 전용)일 수 있어, 행 내 정렬·중복 합치기 전에 사본을 만든다.
+        codes = np.array(column.codes, dtype=np.int32)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(codes), dtype=bool), codes, np.array(column.offsets, dtype=np.int64)),
+            shape=(len(column), len(column.vocab)),
+        )
+        matrix.sum_duplicates()
+        return cls(matrix, {term: code for code, term in enumerate(column.vocab)})
+
+    def matches(self, rows: Sequence[int], terms: Sequence[str]) -> List[List[str]]:
+        """rows 상품마다 terms 중 토큰에 있는 것을 terms 순서대로 돌려준다(희소 슬라이스 한 번)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        known = [(term, self.vocabulary[term]) for term in terms if term in self.vocabulary]
+        if not known or not len(rows):
+            return [[] for _ in range(len(rows))]
+        hits = self.matrix[rows][:, [col for _, col in known]].toarray()
+        return [[known[pos][0] for pos in np.flatnonzero(row).tolist()] for row in hits]
+
+
+class CatalogStore:
+    """enrich_dataframe 결과를 컬럼형 배열로 압축해 보관하는 카탈로그."""
+
+    NUMERIC_COLUMNS = ("product_id", "price", "rating", "popularity", "popularity_norm")
+    STRING_COLUMNS = ("title", "image", "text")
+    LIST_COLUMNS = ("tags", "tokens")
+
+    def __init__(
+        self,
+        numeric: Dict[str, np.ndarray],
+        strings: Dict[str, StringTable],
+        lists: Dict[str, ListColumn],
+        link_codes: np.ndarray,
+        links: StringTable,
+        category_codes: np.ndarray,
+        category_paths: ListColumn,
+        source_codes: np.ndarray,
+        sources: StringTable,
+    ):
+        self.product_id = numeric["product_id"]
+        self.price = numeric["price"]
+        self.rating = numeric["rating"]
+        self.popularity = numeric["popularity"]
+        self.popularity_norm = numeric["popularity_norm"]
+        self._titles = strings["title"]
+        self._images = strings["image"]
+        self._texts = strings["text"]
+        self._tags = lists["tags"]
+        self._tokens = lists["tokens"]
+        self.link_codes = link_codes
+        self.links = links
+        self.category_codes = category_codes
+        self.category_paths = category_paths
+        self.source_codes = source_codes
+        self.sources = sources
+        self._row_index: Optional[Dict[str, int]] = None
+        self._keyword_matrix: Optional[KeywordMatrix] = None
+
+    # ------------------------------------------------------------------
+    # 생성/직렬화
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CatalogStore":
+        """전처리된 데이터프레임을 컬럼형 저장소로 변환한다."""
+        n = len(df)
+
+        def column(name: str, default) -> list:
+            return df[name].tolist() if name in df else [default] * n
+
+        numeric = {
+            "product_id": np.array([str(v) for v in df["product_id"]], dtype=str),
+            "price": df["price"].to_numpy(dtype=np.int64),
+            "rating": df["rating"].to_numpy(dtype=np.float64),
+            "popularity": df["popularity"].to_numpy(dtype=np.int64),
+            "popularity_norm": np.asarray(df["popularity_norm"], dtype=np.float64).reshape(-1)
+            if "popularity_norm" in df
+            else np.full(n, 0.5),
+        }
+        strings = {name: StringTable.from_strings(column(name, "")) for name in cls.STRING_COLUMNS}
+        lists = {name: ListColumn.from_lists(column(name, [])) for name in cls.LIST_COLUMNS}
+
+        link_index: Dict[str, int] = {}
+        link_codes = np.fromiter(
+            (link_index.setdefault(str(v or ""), len(link_index)) for v in column("link", "")),
+            dtype=np.int32,
+            count=n,
+        )
+        source_index: Dict[str, int] = {}
+        source_codes = np.fromiter(
+            (source_index.setdefault(str(v or ""), len(source_index)) for v in column("source", "")),
+            dtype=np.int32,
+            count=n,
+        )
+        path_index: Dict[tuple, int] = {}
+        category_codes = np.fromiter(
+            (
+                path_index.setdefault(tuple(v) if isinstance(v, (list, tuple)) else (), len(path_index))
+                for v in column("category_path", [])
+            ),
+            dtype=np.int32,
+            count=n,
+        )
+        return cls(
+            numeric,
+            strings,
+            lists,
+            link_codes,
+            StringTable.from_strings(list(link_index)),
+            category_codes,
+            ListColumn.from_lists(list(path_index)),
+            source_codes,
+            StringTable.from_strings(list(source_index)),
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """모든 컬럼을 이름 → 넘파이 배열 딕셔너리로 펼친다(인덱스 아티팩트 저장용)."""
+        arrays: Dict[str, np.ndarray] = {
+            "product_id": self.product_id,
+            "price": self.price,
+            "rating": self.rating,
+            "popularity": self.popularity,
+            "popularity_norm": self.popularity_norm,
+            "link_codes": self.link_codes,
+            "category_codes": self.category_codes,
+            "source_codes": self.source_codes,
+        }
+        for name, table in (("title", self._titles), ("image", self._images), ("text", self._texts)):
+            arrays.update(table.to_arrays(name))
+        arrays.update(self._tags.to_arrays("tags"))
+        arrays.update(self._tokens.to_arrays("tokens"))
+        arrays.update(self.links.to_arrays("links"))
+        arrays.update(self.category_paths.to_arrays("category_paths"))
+        arrays.update(self.sources.to_arrays("sources"))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CatalogStore":
+        """to_arrays 결과(또는 np.load한 배열)로 저장소를 복원한다."""
+        return cls(
+            {name: arrays[name] for name in cls.NUMERIC_COLUMNS},
+            {name: StringTable.from_arrays(arrays, name) for name in cls.STRING_COLUMNS},
+            {name: ListColumn.from_arrays(arrays, name) for name in cls.LIST_COLUMNS},
+            arrays["link_codes"],
+            StringTable.from_arrays(arrays, "links"),
+            arrays["category_codes"],
+            ListColumn.from_arrays(arrays, "category_paths"),
+            arrays["source_codes"],
+            StringTable.from_arrays(arrays, "sources"),
+        )
+
+    # ------------------------------------------------------------------
+    # 증분 갱신
+    # ------------------------------------------------------------------
+    def take(self, indices: Sequence[int]) -> "CatalogStore":
+        """선택한 행만 담은 새 저장소를 만든다(원본은 그대로 둔다)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        return CatalogStore(
+            {name: np.asarray(getattr(self, name))[indices] for name in self.NUMERIC_COLUMNS},
+            {
+                "title": self._titles.take(indices),
+                "image": self._images.take(indices),
+                "text": self._texts.take(indices),
+            },
+            {"tags": self._tags.take(indices), "tokens": self._tokens.take(indices)},
+            np.asarray(self.link_codes)[indices],
+            self.links,
+            np.asarray(self.category_codes)[indices],
+            self.category_paths,
+            np.asarray(self.source_codes)[indices],
+            self.sources,
+        )
+
+    def concat(self, other: "CatalogStore") -> "CatalogStore":
+        """other의 행을 뒤에 이어 붙인 새 저장소를 만든다. 범주형 코드는 재매핑한다."""
+        links, link_remap = _merge_tables(self.links, other.links)
+        sources, source_remap = _merge_tables(self.sources, other.sources)
+        path_index = {tuple(self.category_paths[code]): code for code in range(len(self.category_paths))}
+        path_remap = np.fromiter(
+            (
+                path_index.setdefault(tuple(other.category_paths[code]), len(path_index))
+                for code in range(len(other.category_paths))
+            ),
+            dtype=np.int32,
+            count=len(other.category_paths),
+        )
+        category_paths = self.category_paths
+        if len(path_index) > len(self.category_paths):
+            category_paths = ListColumn.from_lists(list(path_index))
+        return CatalogStore(
+            {
+                name: np.concatenate([getattr(self, name), getattr(other, name)])
+                for name in self.NUMERIC_COLUMNS
+            },
+            {
+                "title": self._titles.concat(other._titles),
+                "image": self._images.concat(other._images),
+                "text": self._texts.concat(other._texts),
+            },
+            {"tags": self._tags.concat(other._tags), "tokens": self._tokens.concat(other._tokens)},
+            np.concatenate([self.link_codes, link_remap[other.link_codes]]).astype(np.int32),
+            links,
+            np.concatenate([self.category_codes, path_remap[other.category_codes]]).astype(np.int32),
+            category_paths,
+            np.concatenate([self.source_codes, source_remap[other.source_codes]]).astype(np.int32),
+            sources,
+        )
+
+    def rows_from_sources(self, names: Iterable[str]) -> np.ndarray:
+        """지정한 파트(source) 파일에서 온 행의 불리언 마스크를 만든다."""
+        wanted = {str(name) for name in names}
+        codes = [code for code, value in enumerate(self.sources) if value in wanted]
+        return np.isin(self.source_codes, np.asarray(codes, dtype=np.int32))
+
+    # ------------------------------------------------------------------
+    # 행 접근
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.product_id)
+
+    def title(self, idx: int) -> str:
+        return self._titles[idx]
+
+    def image(self, idx: int) -> str:
+        return self._images[idx]
+
+    def text(self, idx: int) -> str:
+        return self._texts[idx]
+
+    def tags(self, idx: int) -> List[str]:
+        return self._tags[idx]
+
+    def tokens(self, idx: int) -> List[str]:
+        return self._tokens[idx]
+
+    def link(self, idx: int) -> str:
+        return self.links[int(self.link_codes[idx])]
+
+    def category_path(self, idx: int) -> List[str]:
+        return self.category_paths[int(self.category_codes[idx])]
+
+    def source(self, idx: int) -> str:
+        return self.sources[int(self.source_codes[idx])]
+
+    def row_of(self, product_id: str) -> Optional[int]:
+        """product_id에 해당하는 행 인덱스를 O(1)로 찾는다(중복 id는 첫 행)."""
+        if self._row_index is None:
+            index: Dict[str, int] = {}
+            for idx, pid in enumerate(self.product_id.tolist()):
+                index.setdefault(pid, idx)
+            self._row_index = index
+        return self._row_index.get(str(product_id))
+
+    def keyword_matrix(self) -> KeywordMatrix:
+        """
+        tokens 컬럼의 상품 × 토큰 이진 행렬(처음 호출할 때 한 번 만든다).
+
+        서버 환경은 adapter._make_env에서 미리 만들어 두므로 질의 중에는 캐시를 읽기만 한다.
+        """
+        if self._keyword_matrix is None:
+            self._keyword_matrix = KeywordMatrix.from_column(self._tokens)
+        return self._keyword_matrix
+
+    def texts(self) -> Iterator[str]:
+        """전체 text 컬럼을 순서대로 순회한다(TF-IDF 학습 등 일괄 처리용)."""
+        return iter(self._texts)
+
+    def iter_tokens(self) -> Iterator[List[str]]:
+        """전체 tokens 컬럼을 순서대로 순회한다."""
+        for idx in range(len(self)):
+            yield self._tokens[idx]
+
+    def record(self, idx: int) -> Dict:
+        """단일 상품의 필드를 딕셔너리로 만든다(반환되는 Top-K 행에만 사용)."""
+        return {
+            "product_id": self.product_id[idx].item(),
+            "title": self.title(idx),
+            "price": int(self.price[idx]),
+            "rating": float(self.rating[idx]),
+            "popularity": int(self.popularity[idx]),
+            "tags": self.tags(idx),
+            "category_path": self.category_path(idx),
+            "image": self.image(idx),
+            "link": self.link(idx),
+        }
+
+    def to_frame(self, indices: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """선택한 행만 데이터프레임으로 펼친다(디버깅/리포팅용)."""
+        rows = range(len(self)) if indices is None else indices
+        return pd.DataFrame([self.record(int(idx)) for idx in rows])
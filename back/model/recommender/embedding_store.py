@@ -0,0 +1,130 @@
+"""
+정규화된 문서 임베딩을 float16 또는 행별 스케일 int8로 압축 보관하는 저장소.
+
+- float32: 그대로 넘파이 배열(기본값, 압축 없음)
+- float16: 값당 2바이트(약 2배 절감)
+- int8: 값당 1바이트 + 행마다 float32 스케일 하나(약 4배 절감). 행의 최대 절댓값을 127로 맞춘다.
+
+QuantizedEmbeddings는 ``emb @ vec``와 ``emb[rows]``를 지원해 float32 배열 자리에 그대로 쓸 수 있다.
+행렬-벡터 곱은 블록 단위로 복원해 계산하므로 전체 float32 사본을 만들지 않는다.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+# RECO_EMBEDDING_DTYPE: float32(기본) / float16 / int8
+EMBEDDING_DTYPE = os.getenv("RECO_EMBEDDING_DTYPE", "float32").lower()
+_SUPPORTED = ("float32", "float16", "int8")
+_MATVEC_BLOCK = 65536
+
+
+class QuantizedEmbeddings:
+    """float16 코드 또는 int8 코드 + 행별 스케일로 표현한 (N × d) 임베딩 행렬."""
+
+    __slots__ = ("codes", "scales")
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, matrix: np.ndarray, dtype: str) -> "QuantizedEmbeddings":
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if dtype == "float16":
+            return cls(np.ascontiguousarray(matrix, dtype=np.float16))
+        peak = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+        scales = (peak / 127.0).astype(np.float32)
+        safe = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.rint(matrix / safe[:, None]).astype(np.int8)
+        return cls(np.ascontiguousarray(codes), scales)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def size(self) -> int:
+        return self.codes.size
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype_name(self) -> str:
+        return "int8" if self.scales is not None else "float16"
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, rows) -> np.ndarray:
+        """선택한 행을 float32로 복원해 돌려준다."""
+        values = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            scales = np.asarray(self.scales[rows], dtype=np.float32)
+            values = values * (scales[..., None] if values.ndim == 2 else scales)
+        return values
+
+    def __matmul__(self, vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        out = np.empty(self.codes.shape[0], dtype=np.float32)
+        for start in range(0, len(out), _MATVEC_BLOCK):
+            block = self.codes[start : start + _MATVEC_BLOCK]
+            out[start : start + len(block)] = block.astype(np.float32) @ vec
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def take(self, rows: np.ndarray) -> "QuantizedEmbeddings":
+        return QuantizedEmbeddings(self.codes[rows], None if self.scales is None else self.scales[rows])
+
+    def concat(self, other: "QuantizedEmbeddings") -> "QuantizedEmbeddings":
+        codes = np.ascontiguousarray(np.vstack([self.codes, other.codes]))
+        if self.scales is None:
+            return QuantizedEmbeddings(codes)
+        return QuantizedEmbeddings(codes, np.concatenate([self.scales, other.scales]))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"codes": self.codes}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "QuantizedEmbeddings":
+        return cls(arrays["codes"], arrays.get("scales"))
+
+
+Embeddings = Union[np.ndarray, QuantizedEmbeddings]
+
+
+def compress_embeddings(matrix: np.ndarray, dtype: Optional[str] = None) -> Embeddings:
+    """설정된 저장 형식으로 임베딩을 압축한다(float32이면 배열을 그대로 반환)."""
+    dtype = (dtype or EMBEDDING_DTYPE).lower()
+    if dtype not in _SUPPORTED:
+        raise ValueError(f"지원하지 않는 임베딩 저장 형식입니다: {dtype} (가능: {', '.join(_SUPPORTED)})")
+    if dtype == "float32":
+        return np.ascontiguousarray(matrix, dtype=np.float32)
+    return QuantizedEmbeddings.quantize(matrix, dtype)
+
+
+def take_rows(embeddings: Embeddings, rows: np.ndarray) -> Embeddings:
+    """압축 형식을 유지한 채 일부 행만 남긴다."""
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings.take(rows)
+    return np.asarray(embeddings)[rows]
+
+
+def concat_rows(base: Embeddings, extra: Embeddings) -> Embeddings:
+    """같은 형식의 두 임베딩 행렬을 위아래로 잇는다."""
+    if isinstance(base, QuantizedEmbeddings):
+        return base.concat(extra)
+    return np.ascontiguousarray(np.vstack([base, extra]), dtype=np.float32)
@@ -0,0 +1,262 @@
+"""
+추천 환경(catalog, vectors)을 버전 디렉터리 단위로 저장/복원하는 인덱스 아티팩트 저장소.
+
+- 입력 part_*.jsonl 파일의 크기/mtime/해시로 지문(fingerprint)을 만든다.
+- 컬럼형 카탈로그 배열, TF-IDF 어휘·IDF·CSR 버퍼, 문서 임베딩을 ``<root>/<version>/``에 기록한다.
+- ``LATEST`` 포인터가 가리키는 버전의 지문이 현재 입력과 같을 때만 복원한다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+_catalog_module = importlib.import_module("catalog_store")
+CatalogStore = _catalog_module.CatalogStore
+ProductFragments = _catalog_module.ProductFragments
+
+_sample_module = importlib.import_module("1_sample_data")
+list_part_files = _sample_module.list_part_files
+
+_modeling = importlib.import_module("3_modeling")
+restore_tfidf = _modeling.restore_tfidf
+QueryVectorizer = _modeling.QueryVectorizer
+
+IVFIndex = importlib.import_module("ann_index").IVFIndex
+_inverted_module = importlib.import_module("inverted_index")
+BM25Index = _inverted_module.BM25Index
+InvertedIndex = _inverted_module.InvertedIndex
+QuantizedEmbeddings = importlib.import_module("embedding_store").QuantizedEmbeddings
+
+# 저장 형식이 바뀌면 올린다. 지문에 포함되므로 구버전 아티팩트는 자동으로 무시된다.
+INDEX_FORMAT_VERSION = 14
+
+_ENV_INDEX_DIR = os.getenv("RECOMMENDER_INDEX_DIR")
+INDEX_DIR = (
+    Path(_ENV_INDEX_DIR)
+    if _ENV_INDEX_DIR
+    else Path(__file__).resolve().parents[1] / "artifacts" / "recommender_index"
+)
+
+_LATEST_FILE = "LATEST"
+_MANIFEST_FILE = "manifest.json"
+_HASH_CHUNK = 1 << 20
+
+
+def _hash_file(path: Path) -> str:
+    """파일 내용을 청크 단위로 읽어 SHA-1 해시를 계산한다."""
+    digest = hashlib.sha1()
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_sources(source: Union[str, Path], previous: Optional[Dict] = None) -> Dict[str, Dict]:
+    """
+    입력 파일별 크기/mtime/해시 정보를 수집한다.
+
+    이전 매니페스트의 크기·mtime이 그대로인 파일은 해시를 다시 계산하지 않는다.
+    """
+    source = Path(source)
+    files = [source] if source.is_file() else list_part_files(source)
+    previous = previous or {}
+    entries: Dict[str, Dict] = {}
+    for path in files:
+        stat = path.stat()
+        prev = previous.get(path.name)
+        if prev and prev.get("size") == stat.st_size and prev.get("mtime_ns") == stat.st_mtime_ns:
+            digest = prev["sha1"]
+        else:
+            digest = _hash_file(path)
+        entries[path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest}
+    return entries
+
+
+def compute_fingerprint(sources: Dict[str, Dict], params: Dict) -> str:
+    """입력 파일 해시와 빌드 파라미터, 저장 형식 버전을 묶어 지문을 만든다."""
+    payload = {
+        "format": INDEX_FORMAT_VERSION,
+        "params": params,
+        "sources": {name: entry["sha1"] for name, entry in sorted(sources.items())},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def read_manifest(root: Union[str, Path, None] = None) -> Optional[Dict]:
+    """LATEST 포인터가 가리키는 버전의 매니페스트를 읽는다(없으면 None)."""
+    root = Path(root) if root else INDEX_DIR
+    try:
+        version = (root / _LATEST_FILE).read_text(encoding="utf-8").strip()
+        manifest = json.loads((root / version / _MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != INDEX_FORMAT_VERSION:
+        return None
+    manifest["path"] = str(root / version)
+    return manifest
+
+
+def _write_text_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _prune_versions(root: Path, keep: int):
+    """최근 ``keep``개 버전만 남기고 오래된 아티팩트 디렉터리를 지운다."""
+    versions = sorted(p for p in root.glob(f"v{INDEX_FORMAT_VERSION}-*") if p.is_dir())
+    for stale in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def _save_arrays(directory: Path, arrays: Dict[str, np.ndarray]):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(directory / f"{name}.npy", np.ascontiguousarray(array))
+
+
+def _load_arrays(directory: Path, mmap_mode: Optional[str]) -> Dict[str, np.ndarray]:
+    return {path.name[: -len(".npy")]: np.load(path, mmap_mode=mmap_mode) for path in directory.glob("*.npy")}
+
+
+def save_index(
+    catalog: CatalogStore,
+    vectors: Dict,
+    sources: Dict[str, Dict],
+    params: Dict,
+    root: Union[str, Path, None] = None,
+    keep: int = 2,
+) -> Path:
+    """
+    환경을 새 버전 디렉터리에 기록하고 LATEST 포인터를 원자적으로 교체한다.
+
+    임시 디렉터리에 모두 쓴 뒤 rename 하므로, 다른 워커는 완성된 버전만 보게 된다.
+    """
+    root = Path(root) if root else INDEX_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    fingerprint = compute_fingerprint(sources, params)
+    version = f"v{INDEX_FORMAT_VERSION}-{time.strftime('%Y%m%dT%H%M%S')}-{fingerprint[:10]}"
+    tmp_dir = root / f".{version}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    vectorizer = vectors["tfidf_vectorizer"]
+    tfidf = sparse.csr_matrix(vectors["tfidf_matrix"])
+    _save_arrays(tmp_dir / "catalog", catalog.to_arrays())
+    vocabulary = vectors["query_vectorizer"].features.tolist()
+    (tmp_dir / "vocabulary.json").write_text(json.dumps(vocabulary, ensure_ascii=False), encoding="utf-8")
+    np.save(tmp_dir / "idf.npy", np.asarray(vectorizer.idf_))
+    np.save(tmp_dir / "tfidf_data.npy", tfidf.data)
+    np.save(tmp_dir / "tfidf_indices.npy", tfidf.indices)
+    np.save(tmp_dir / "tfidf_indptr.npy", tfidf.indptr)
+    doc_embeddings = vectors["doc_embeddings"]
+    if isinstance(doc_embeddings, QuantizedEmbeddings):
+        _save_arrays(tmp_dir / "embeddings", doc_embeddings.to_arrays())
+    else:
+        np.save(tmp_dir / "doc_embeddings.npy", np.ascontiguousarray(doc_embeddings, dtype=np.float32))
+    np.save(tmp_dir / "doc_zero_norm.npy", np.asarray(vectors["doc_zero_norm"], dtype=bool))
+    if vectors.get("ann_index") is not None:
+        _save_arrays(tmp_dir / "ann", vectors["ann_index"].to_arrays())
+    _save_arrays(tmp_dir / "inverted", vectors["inverted_index"].to_arrays())
+    if vectors.get("bm25_index") is not None:
+        _save_arrays(tmp_dir / "bm25", vectors["bm25_index"].to_arrays())
+    _save_arrays(tmp_dir / "slot_bits", vectors["slot_bits"])
+    _save_arrays(tmp_dir / "fragments", vectors["fragments"].to_arrays())
+    if vectors.get("static_prior") is not None:
+        np.save(tmp_dir / "static_prior.npy", np.asarray(vectors["static_prior"], dtype=np.float64))
+    if vectors.get("feature_vectors") is not None:
+        np.save(tmp_dir / "feature_vectors.npy", np.ascontiguousarray(vectors["feature_vectors"]))
+        np.save(tmp_dir / "feature_in_vocab.npy", np.asarray(vectors["feature_in_vocab"]))
+
+    manifest = {
+        "format": INDEX_FORMAT_VERSION,
+        "version": version,
+        "fingerprint": fingerprint,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": params,
+        "sources": sources,
+        "n_items": int(len(catalog)),
+        "tfidf_shape": list(tfidf.shape),
+    }
+    (tmp_dir / _MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_dir, root / version)
+    _write_text_atomic(root / _LATEST_FILE, version)
+    _prune_versions(root, keep)
+    return root / version
+
+
+def load_index(
+    source: Union[str, Path],
+    params: Dict,
+    root: Union[str, Path, None] = None,
+    mmap: bool = True,
+    w2v=None,
+    w2v_neighbors=None,
+) -> Optional[Tuple[CatalogStore, Dict, Dict]]:
+    """
+    최신 아티팩트의 지문이 현재 입력·파라미터와 같으면 (catalog, vectors, manifest)를 반환한다.
+
+    지문이 다르거나 아티팩트가 없으면 None을 돌려 호출 측이 재빌드하도록 한다.
+    mmap=True이면 대용량 배열을 메모리 매핑해 워커 간에 페이지를 공유한다.
+    w2v는 빌드 때와 같은 W2V 모델(params["w2v"]로 지문에 반영됨)로, w2v_neighbors(그 이웃 표)와 함께 질의 확장에 쓰인다.
+    """
+    manifest = read_manifest(root)
+    if manifest is None:
+        return None
+    sources = scan_sources(source, previous=manifest.get("sources"))
+    if compute_fingerprint(sources, params) != manifest.get("fingerprint"):
+        return None
+    # 현재 stat 값으로 갱신해 두면 이후 증분 감시에서 불필요한 재해시를 피한다.
+    manifest["sources"] = sources
+
+    path = Path(manifest["path"])
+    mode = "r" if mmap else None
+    catalog = CatalogStore.from_arrays(_load_arrays(path / "catalog", mode))
+    vocabulary = json.loads((path / "vocabulary.json").read_text(encoding="utf-8"))
+    idf = np.load(path / "idf.npy")
+    vectorizer = restore_tfidf(vocabulary, idf)
+    tfidf_matrix = sparse.csr_matrix(
+        (
+            np.load(path / "tfidf_data.npy", mmap_mode=mode),
+            np.load(path / "tfidf_indices.npy", mmap_mode=mode),
+            np.load(path / "tfidf_indptr.npy", mmap_mode=mode),
+        ),
+        shape=tuple(manifest["tfidf_shape"]),
+        copy=False,
+    )
+    has_features = (path / "feature_vectors.npy").exists()
+    ann_dir = path / "ann"
+    vectors = {
+        "tfidf_vectorizer": vectorizer,
+        "tfidf_matrix": tfidf_matrix,
+        "query_vectorizer": QueryVectorizer(vocabulary, idf),
+        "doc_embeddings": (
+            QuantizedEmbeddings.from_arrays(_load_arrays(path / "embeddings", mode))
+            if (path / "embeddings").is_dir()
+            else np.load(path / "doc_embeddings.npy", mmap_mode=mode)
+        ),
+        "doc_zero_norm": np.load(path / "doc_zero_norm.npy"),
+        "ann_index": IVFIndex.from_arrays(_load_arrays(ann_dir, mode)) if ann_dir.is_dir() else None,
+        "inverted_index": InvertedIndex.from_arrays(_load_arrays(path / "inverted", mode)),
+        "bm25_index": (
+            BM25Index.from_arrays(_load_arrays(path / "bm25", mode)) if (path / "bm25").is_dir() else None
+        ),
+        "slot_bits": _load_arrays(path / "slot_bits", mode),
+        "fragments": ProductFragments.from_arrays(_load_arrays(path / "fragments", mode)),
+        "static_prior": np.load(path / "static_prior.npy") if (path / "static_prior.npy").exists() else None,
+        "feature_vectors": np.load(path / "feature_vectors.npy", mmap_mode=mode) if has_features else None,
+        "feature_in_vocab": np.load(path / "feature_in_vocab.npy") if has_features else None,
+        "w2v": w2v,
+        "w2v_neighbors": w2v_neighbors,
+    }
+    return catalog, vectors, manifest
@@ -0,0 +1,241 @@
+"""
+TF-IDF 행렬 위의 역색인(포스팅 리스트)과 MaxScore 방식 상위 k 검색.
+
+- TF-IDF(CSR)를 CSC로 전치해 어휘 항목별 (문서 id 오름차순, 가중치) 포스팅으로 쓴다.
+- 항목별 최대 가중치를 미리 구해 두고, 질의 가중치와 곱한 값을 점수 상한으로 쓴다.
+- 상한이 큰 항목부터 누적하다가 남은 항목 상한의 합이 현재 k번째 점수보다 작아지면
+  새 문서를 더 받지 않고, 이미 본 후보만 이진 탐색으로 갱신한다(MaxScore 가지치기).
+- 누산은 포스팅에 나온 문서만 담은 압축 후보 배열에서 하므로 비용이 문서 수가 아니라
+  질의 포스팅 길이에 비례한다. 포스팅이 문서 수에 견줄 만큼 길면 전체 스캔으로 넘어간다.
+
+TF-IDF 행과 질의 벡터가 모두 L2 정규화되어 있으므로 누적 점수가 곧 코사인 유사도다.
+BM25Index는 같은 포스팅 구조에 BM25 문서-항목 가중치를 담아 같은 방식으로 검색한다.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# RECO_INVERTED: MaxScore 가지치기 사용 여부. auto(카탈로그가 INVERTED_MIN_ITEMS 이상일 때) / 1 / 0(항상 전체 계산)
+INVERTED_MODE = os.getenv("RECO_INVERTED", "auto").lower()
+INVERTED_MIN_ITEMS = int(os.getenv("RECO_INVERTED_MIN_ITEMS", "50000"))
+# 질의 포스팅 합계가 문서 수의 이 배수 이상이면 top_k도 전체 스캔으로 계산한다(tools/benchmark_lexical_topk.py)
+INVERTED_DENSE_RATIO = float(os.getenv("RECO_INVERTED_DENSE_RATIO", "0.01"))
+# 어휘 후보로 남길 문서 수(TF-IDF 점수 상위 k)
+LEXICAL_TOP_K = int(os.getenv("RECO_LEXICAL_TOP_K", "1000"))
+# 기본 어휘 점수 엔진: tfidf(코사인) / bm25. run_recommender(lexical_engine=...)로 요청별 지정 가능
+LEXICAL_ENGINE = os.getenv("RECO_LEXICAL_ENGINE", "tfidf").lower()
+LEXICAL_ENGINES = ("tfidf", "bm25")
+
+
+def use_pruning(n_docs: int) -> bool:
+    """질의 시 top_k 가지치기로 어휘 후보를 줄일지(아니면 scores로 전체 계산)."""
+    if INVERTED_MODE in ("0", "off", "false"):
+        return False
+    if INVERTED_MODE in ("1", "on", "true"):
+        return n_docs > 0
+    return n_docs >= INVERTED_MIN_ITEMS
+
+
+def _merge_postings(
+    cand_ids: np.ndarray, cand_scores: np.ndarray, docs: List[np.ndarray], values: List[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """후보 (id, 점수)에 포스팅 조각들을 합쳐 id 오름차순 후보로 만든다."""
+    ids, inverse = np.unique(np.concatenate([cand_ids, *docs]), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate([cand_scores, *values]), minlength=len(ids))
+    return ids, scores
+
+
+class InvertedIndex:
+    """CSC 버퍼(indptr/indices/data)와 항목별 최대 가중치로 구성된 역색인."""
+
+    __slots__ = ("indptr", "indices", "data", "term_max", "n_docs")
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, term_max: np.ndarray, n_docs: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.term_max = term_max
+        self.n_docs = n_docs
+
+    @classmethod
+    def from_tfidf(cls, tfidf_matrix: sparse.spmatrix) -> "InvertedIndex":
+        csc = sparse.csc_matrix(tfidf_matrix)
+        csc.sort_indices()
+        term_max = np.zeros(csc.shape[1], dtype=csc.data.dtype)
+        nonempty = np.flatnonzero(np.diff(csc.indptr))
+        if len(nonempty):
+            term_max[nonempty] = np.maximum.reduceat(csc.data, csc.indptr[nonempty])
+        return cls(csc.indptr, csc.indices, csc.data, term_max, csc.shape[0])
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def scores(self, terms: Sequence[int], weights: Sequence[float]) -> np.ndarray:
+        """
+        모든 문서의 질의 점수(전체 행렬 곱과 같음)를 질의 어휘 열의 포스팅만 더해 구한다.
+        """
+        acc = np.zeros(self.n_docs, dtype=np.float64)
+        for term, weight in zip(np.asarray(terms).tolist(), np.asarray(weights).tolist()):
+            docs, values = self.postings(term)
+            acc[docs] += values * weight
+        return acc
+
+    def top_k(self, terms: Sequence[int], weights: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        질의 항목(열 번호)과 가중치로 점수 상위 k 문서의 (id 오름차순, 정확한 점수)를 돌려준다.
+
+        반환되는 점수는 전체 스캔(질의 · 문서)과 같고, 점수 0인 문서는 포함하지 않는다.
+        질의 포스팅 합계가 문서 수의 INVERTED_DENSE_RATIO배 이상이면 후보 압축이 이득이 없으므로
+        전체 스캔(scores) 뒤 argpartition으로 고른다.
+        """
+        terms = np.asarray(terms, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        k = max(1, int(k))
+        lengths = self.indptr[terms + 1] - self.indptr[terms]
+        if lengths.sum() >= INVERTED_DENSE_RATIO * self.n_docs:
+            acc = self.scores(terms, weights)
+            cand_ids = np.flatnonzero(acc > 0)
+            if len(cand_ids) > k:
+                cand_ids = np.sort(cand_ids[np.argpartition(-acc[cand_ids], k - 1)[:k]])
+            return cand_ids, acc[cand_ids]
+
+        bounds = weights * self.term_max[terms]
+        order = np.argsort(-bounds, kind="stable")
+        terms, weights, bounds = terms[order], weights[order], bounds[order]
+        # remaining[i]: i번째 항목 이후 항목들이 더할 수 있는 최대 점수
+        remaining = np.concatenate([np.cumsum(bounds[::-1])[::-1][1:], [0.0]])
+
+        # 후보는 포스팅에 나온 문서만 (id 오름차순, 누적 점수)로 들고 다닌다(N 크기 누산기 없음).
+        # 새 문서를 받는 동안의 포스팅은 모아 두었다가 후보가 k개에 이를 수 있을 때 한 번에 합친다.
+        cand_ids = np.zeros(0, dtype=self.indices.dtype)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        pending_docs, pending_values, pending = [], [], 0
+        admitting = True
+        last = len(terms) - 1
+        for i, (term, weight) in enumerate(zip(terms.tolist(), weights.tolist())):
+            docs, values = self.postings(term)
+            if admitting:
+                pending_docs.append(docs)
+                pending_values.append(values * weight)
+                pending += len(docs)
+                if len(cand_ids) + pending < k and i < last:
+                    continue
+                cand_ids, cand_scores = _merge_postings(cand_ids, cand_scores, pending_docs, pending_values)
+                pending_docs, pending_values, pending = [], [], 0
+            elif len(docs):
+                # 가지치기 이후: 남은 후보만 이 포스팅에서 이진 탐색해 갱신한다.
+                pos = np.searchsorted(docs, cand_ids)
+                pos[pos == len(docs)] = 0
+                hit = docs[pos] == cand_ids
+                cand_scores[hit] += values[pos[hit]] * weight
+            if len(cand_scores) < k:
+                continue
+            theta = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+            # 아직 못 본 문서의 최대 점수(remaining[i])가 k번째 점수에 못 미치면 새 문서는 받지 않는다.
+            if admitting and remaining[i] >= theta:
+                continue
+            admitting = False
+            alive = cand_scores + remaining[i] >= theta
+            cand_ids, cand_scores = cand_ids[alive], cand_scores[alive]
+
+        positive = cand_scores > 0
+        cand_ids, cand_scores = cand_ids[positive], cand_scores[positive]
+        if len(cand_ids) > k:
+            keep = np.sort(np.argpartition(-cand_scores, k - 1)[:k])
+            cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+        return cand_ids, cand_scores
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "data": self.data,
+            "term_max": self.term_max,
+            "n_docs": np.asarray([self.n_docs], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "InvertedIndex":
+        return cls(arrays["indptr"], arrays["indices"], arrays["data"], arrays["term_max"], int(arrays["n_docs"][0]))
+
+
+def _bm25_weights(counts: sparse.spmatrix, idf: np.ndarray, avgdl: float, k1: float, b: float) -> sparse.csr_matrix:
+    counts = sparse.csr_matrix(counts, dtype=np.float64, copy=True)
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    row_lengths = np.repeat(lengths, np.diff(counts.indptr))
+    tf = counts.data
+    norm = k1 * (1.0 - b + b * row_lengths / avgdl)
+    counts.data = idf[counts.indices] * tf * (k1 + 1.0) / (tf + norm)
+    return counts
+
+
+class BM25Index:
+    """
+    Okapi BM25 가중치를 미리 계산해 둔 포스팅 역색인.
+
+    문서-항목 가중치 idf(t) · tf·(k1+1) / (tf + k1·(1 - b + b·dl/avgdl))를 빌드 때 구해 CSC로
+    저장하므로, 질의 점수는 질의 항목 열의 포스팅 합(× 질의 내 빈도)이다. IDF·평균 길이는
+    빌드 시점 값으로 고정해 증분 반영 때는 추가 문서 가중치만 계산한다.
+    """
+
+    __slots__ = ("postings", "idf", "avgdl", "k1", "b")
+
+    def __init__(self, postings: InvertedIndex, idf: np.ndarray, avgdl: float, k1: float, b: float):
+        self.postings = postings
+        self.idf = idf
+        self.avgdl = avgdl
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def n_docs(self) -> int:
+        return self.postings.n_docs
+
+    @classmethod
+    def from_counts(cls, counts: sparse.spmatrix, k1: float, b: float) -> "BM25Index":
+        """(문서 × 항목) 빈도 행렬로 IDF·평균 문서 길이를 구하고 인덱스를 만든다."""
+        counts = sparse.csr_matrix(counts)
+        n_docs = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avgdl = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        postings = InvertedIndex.from_tfidf(_bm25_weights(counts, idf, avgdl, k1, b))
+        return cls(postings, idf, avgdl, k1, b)
+
+    def weights(self, counts: sparse.spmatrix) -> sparse.csr_matrix:
+        """빈도 행렬을 고정된 IDF·avgdl 기준 BM25 가중치 행렬로 바꾼다."""
+        return _bm25_weights(counts, self.idf, self.avgdl, self.k1, self.b)
+
+    def extend(self, keep: np.ndarray, added_counts: sparse.spmatrix) -> "BM25Index":
+        """keep 행만 남기고 추가 문서를 덧붙인 새 인덱스(IDF·avgdl은 그대로)."""
+        postings = self.postings
+        matrix = sparse.csc_matrix(
+            (postings.data, postings.indices, postings.indptr), shape=(postings.n_docs, len(self.idf))
+        ).tocsr()
+        merged = sparse.vstack([matrix[np.asarray(keep, dtype=np.int64)], self.weights(added_counts)], format="csr")
+        return BM25Index(InvertedIndex.from_tfidf(merged), self.idf, self.avgdl, self.k1, self.b)
+
+    def scores(self, terms: Sequence[int], counts: Sequence[float]) -> np.ndarray:
+        return self.postings.scores(terms, counts)
+
+    def top_k(self, terms: Sequence[int], counts: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.postings.top_k(terms, counts, k)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = self.postings.to_arrays()
+        arrays.update(
+            {"idf": self.idf, "params": np.asarray([self.avgdl, self.k1, self.b], dtype=np.float64)}
+        )
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "BM25Index":
+        avgdl, k1, b = (float(value) for value in np.asarray(arrays["params"]))
+        return cls(InvertedIndex.from_arrays(arrays), np.asarray(arrays["idf"]), avgdl, k1, b)
@@ -46,17 +46,17 @@ def parse_args():
 
 def main():
     args = parse_args()
-    df, vectors = prepare_environment()
+    catalog, vectors = prepare_environment()
     print(f"질의: {args.query}")
     results, summary = run_query(
         query=args.query,
-        df=df,
+        catalog=catalog,
         vectors=vectors,
         hard_budget=args.hard_budget,
         k=args.k,
     )
-    display_results(results, summary["slots"])
-    run_samples(df, vectors, args.hard_budget, args.k)
+    display_results(results, catalog, summary["slots"])
+    run_samples(catalog, vectors, args.hard_budget, args.k)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+"""
+Word2Vec 어휘 전체의 상위 N 이웃(이웃 id, 코사인)을 미리 계산해 둔 표.
+
+- 단위 벡터 행렬을 블록 단위로 곱해 단어마다 자기 자신을 뺀 상위 N개를 고른다
+  (gensim ``most_similar``와 같은 코사인·내림차순).
+- 모델 아티팩트 옆에 ``<모델>.neighbors_ids.npy``/``.neighbors_scores.npy``로 저장하고
+  mmap으로 열어, 질의 확장은 어휘 크기와 무관하게 행 하나를 읽는 것으로 끝난다.
+- 표는 retrain_word2vec.py가 모델과 함께 만든다. 서버 기동 시에는 열기만 하고, 표가 없으면
+  O(V²) 계산 대신 most_similar로 확장한다.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# 표에 담을 단어당 이웃 수(질의 확장은 상위 5개를 본다)
+NEIGHBOR_WIDTH = int(os.getenv("RECO_W2V_NEIGHBORS", "10"))
+
+_BLOCK_CELLS = 1 << 24
+
+
+def _sidecar_paths(model_path: Path) -> Tuple[Path, Path]:
+    return (
+        model_path.with_name(f"{model_path.stem}.neighbors_ids.npy"),
+        model_path.with_name(f"{model_path.stem}.neighbors_scores.npy"),
+    )
+
+
+class NeighborTable:
+    """단어별 이웃 id(V × N, 유사도 내림차순)와 유사도로 구성된 이웃 표."""
+
+    __slots__ = ("ids", "scores", "index_to_key", "key_to_index")
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray, index_to_key: List[str], key_to_index: Dict[str, int]):
+        self.ids = ids
+        self.scores = scores
+        self.index_to_key = index_to_key
+        self.key_to_index = key_to_index
+
+    @property
+    def width(self) -> int:
+        return self.ids.shape[1]
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.key_to_index
+
+    @classmethod
+    def build(cls, wv, width: Optional[int] = None) -> "NeighborTable":
+        """KeyedVectors 전체 어휘의 상위 width 이웃을 계산한다(노름 0 단어는 유사도 0)."""
+        width = max(1, min(width or NEIGHBOR_WIDTH, len(wv) - 1))
+        vectors = np.asarray(wv.vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        unit = vectors / np.where(norms == 0, 1.0, norms).astype(np.float32)[:, None]
+        n_words = len(unit)
+        ids = np.empty((n_words, width), dtype=np.int32)
+        scores = np.empty((n_words, width), dtype=np.float32)
+        block = max(1, _BLOCK_CELLS // max(n_words, 1))
+        for start in range(0, n_words, block):
+            rows = np.arange(start, min(start + block, n_words))
+            sims = unit[rows] @ unit.T
+            sims[np.arange(len(rows)), rows] = -np.inf
+            top = np.argpartition(-sims, width - 1, axis=1)[:, :width]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            ids[rows] = np.take_along_axis(top, order, axis=1)
+            scores[rows] = np.take_along_axis(top_scores, order, axis=1)
+        return cls(ids, scores, wv.index_to_key, wv.key_to_index)
+
+    def most_similar(self, word: str, topn: int = 5) -> List[Tuple[str, float]]:
+        """gensim ``most_similar``처럼 (단어, 코사인) 목록을 돌려준다(topn은 표 너비까지)."""
+        row = self.key_to_index[word]
+        keys = self.index_to_key
+        return [
+            (keys[idx], score)
+            for idx, score in zip(self.ids[row, :topn].tolist(), self.scores[row, :topn].tolist())
+        ]
+
+    def save(self, model_path: Union[str, Path]):
+        """
+        모델 아티팩트 옆에 표를 저장한다.
+
+        임시 이름으로 쓴 뒤 scores → ids 순으로 옮기므로 ids가 보이면 scores도 이미 제자리에 있다.
+        """
+        ids_path, scores_path = _sidecar_paths(Path(model_path))
+        for array, path in ((self.scores, scores_path), (self.ids, ids_path)):
+            tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+            with tmp.open("wb") as fp:
+                np.save(fp, np.ascontiguousarray(array))
+            os.replace(tmp, path)
+
+
+def open_neighbor_table(model_path: Union[str, Path], wv, width: Optional[int] = None) -> Optional[NeighborTable]:
+    """
+    모델 아티팩트 옆에 저장된 이웃 표를 mmap으로 연다.
+
+    표가 없거나, 모델보다 오래됐거나, 어휘 수·너비가 맞지 않으면 None이다(호출 측은
+    most_similar로 확장한다). 표는 build_neighbor_table(retrain_word2vec.py)이 만든다.
+    """
+    model_path = Path(model_path)
+    width = max(1, min(width or NEIGHBOR_WIDTH, len(wv) - 1))
+    ids_path, scores_path = _sidecar_paths(model_path)
+    try:
+        if ids_path.stat().st_mtime_ns < model_path.stat().st_mtime_ns:
+            return None
+        ids = np.load(ids_path, mmap_mode="r")
+        scores = np.load(scores_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if ids.shape != scores.shape or ids.shape[0] != len(wv) or ids.shape[1] < width:
+        return None
+    return NeighborTable(ids, scores, wv.index_to_key, wv.key_to_index)
+
+
+def build_neighbor_table(model_path: Union[str, Path], wv, width: Optional[int] = None) -> NeighborTable:
+    """이웃 표를 계산해 모델 아티팩트 옆에 저장한다(저장 실패는 OSError로 그대로 올린다)."""
+    table = NeighborTable.build(wv, width)
+    table.save(model_path)
+    return table
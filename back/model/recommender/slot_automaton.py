@@ -0,0 +1,89 @@
+"""
+슬롯 사전(상황/관계/금기/힌트)을 하나로 묶은 Aho-Corasick 다중 패턴 오토마톤.
+
+- 모든 표현을 (종류, 표준 키) 꼬리표와 함께 트라이에 넣고 실패 링크를 BFS로 잇는다.
+- 텍스트를 한 번 훑으면 겹치는 일치까지 모두 나오므로, 결과는 표현마다 ``pattern in text``를
+  따로 검사한 것과 같고 비용은 사전 크기가 아니라 텍스트 길이에 비례한다.
+- 종류별 키 순서(사전 정의 순서)를 기억해 "맵에서 먼저 나온 슬롯" 규칙도 그대로 재현한다.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+Hit = Tuple[str, str]
+
+
+class SlotAutomaton:
+    """(종류, 표준 키)를 출력으로 갖는 Aho-Corasick 오토마톤."""
+
+    __slots__ = ("_goto", "_fail", "_out", "order")
+
+    def __init__(self, groups: Mapping[str, Mapping[str, Iterable[str]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Tuple[Hit, ...]] = [()]
+        # 종류 → {표준 키: 사전 정의 순서}
+        self.order: Dict[str, Dict[str, int]] = {}
+        for kind, mapping in groups.items():
+            self.order[kind] = {key: rank for rank, key in enumerate(mapping)}
+            for key, patterns in mapping.items():
+                for pattern in patterns:
+                    if pattern:
+                        self._add(pattern, (kind, key))
+        self._fail = [0] * len(self._goto)
+        self._link()
+
+    def _add(self, pattern: str, hit: Hit):
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._out.append(())
+            node = nxt
+        if hit not in self._out[node]:
+            self._out[node] += (hit,)
+
+    def _link(self):
+        """BFS로 실패 링크를 잇고, 실패 경로의 출력을 각 노드에 합쳐 둔다."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                extra = tuple(hit for hit in self._out[self._fail[child]] if hit not in self._out[child])
+                if extra:
+                    self._out[child] += extra
+
+    def hits(self, text: str) -> Set[Hit]:
+        """텍스트에 나타나는 모든 (종류, 표준 키)를 한 번의 순회로 구한다."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[Hit] = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """hits를 종류별 표준 키 집합으로 묶는다(일치가 없는 종류는 빈 집합)."""
+        grouped: Dict[str, Set[str]] = {kind: set() for kind in self.order}
+        for kind, key in self.hits(text):
+            grouped[kind].add(key)
+        return grouped
+
+    def first(self, kind: str, keys: Iterable[str]) -> str:
+        """keys 중 사전에 먼저 정의된 키(없으면 빈 문자열)."""
+        order = self.order[kind]
+        return min(keys, key=order.__getitem__, default="")
@@ -0,0 +1,77 @@
+"""
+Measure recall and latency of the IVF semantic index against exact search.
+
+Builds a fresh IVF index over the current environment's document embeddings, then for
+random catalog items used as queries compares the ANN top-M with the exact top-M
+(one matvec over all documents) for each --nprobe value.
+
+Usage:
+    python back/tools/benchmark_ann_recall.py [--data-dir DIR] [--nlist 0] [--nprobe 1 4 8 16] [--top-m 2000] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+
+IVFIndex = importlib.import_module("ann_index").IVFIndex
+prepare_environment = importlib.import_module("7_pipeline").prepare_environment
+
+
+def _exact_top(embeddings: np.ndarray, query: np.ndarray, top_m: int) -> np.ndarray:
+    scores = embeddings @ query
+    if len(scores) > top_m:
+        return np.argpartition(-scores, top_m - 1)[:top_m]
+    return np.arange(len(scores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF recall/latency against exact search.")
+    parser.add_argument("--data-dir", default=None, help="Directory with part_*.jsonl files")
+    parser.add_argument("--nlist", type=int, default=0, help="Number of IVF lists (0 = sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--top-m", type=int, default=int(os.getenv("RECO_ANN_TOP_M", "2000")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    _, vectors = prepare_environment(args.data_dir)
+    doc_embeddings = vectors["doc_embeddings"]
+    embeddings = np.asarray(doc_embeddings[np.arange(len(doc_embeddings))], dtype=np.float32)
+    zero_norm = np.asarray(vectors["doc_zero_norm"], dtype=bool)
+    if zero_norm.all():
+        raise SystemExit("All document embeddings are zero (no Word2Vec artifact?); nothing to benchmark.")
+
+    started = time.perf_counter()
+    index = IVFIndex.build(embeddings, zero_norm, n_lists=args.nlist or None)
+    print(f"[ann] built {index.n_lists} lists over {len(index.ids)} docs in {time.perf_counter() - started:.2f}s")
+
+    rng = np.random.default_rng(args.seed)
+    pool = np.flatnonzero(~zero_norm)
+    queries = embeddings[rng.choice(pool, size=min(args.queries, len(pool)), replace=False)]
+    top_m = min(args.top_m, len(pool))
+
+    started = time.perf_counter()
+    exact = [set(_exact_top(embeddings, q, top_m).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"[ann] exact search: {exact_ms:.3f} ms/query (top-{top_m} of {len(embeddings)})")
+    print(f"{'nprobe':>7} {'recall':>8} {'ms/query':>9} {'speedup':>8}")
+    for n_probe in args.nprobe:
+        started = time.perf_counter()
+        found = [index.search(embeddings, q, top_m=top_m, n_probe=n_probe)[0] for q in queries]
+        ann_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = np.mean([len(truth.intersection(ids.tolist())) / len(truth) for truth, ids in zip(exact, found)])
+        print(f"{n_probe:>7} {recall:>8.4f} {ann_ms:>9.3f} {exact_ms / ann_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
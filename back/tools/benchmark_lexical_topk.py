@@ -0,0 +1,101 @@
+"""
+Measure latency of the inverted-index top-k kernel against the full posting scan.
+
+Builds a synthetic Zipf-distributed (docs x terms) weight matrix, then for random queries
+drawn from common terms (low term ids) and rare terms (high term ids) compares
+``InvertedIndex.top_k`` with the full scan (``scores`` + argpartition) and checks that both
+return the same scores (documents tied at the k-th score may differ).
+
+Usage:
+    python back/tools/benchmark_lexical_topk.py [--docs 300000] [--terms 20000] [--doc-len 30] [--query-terms 10] [--k 1000] [--queries 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+
+_inverted = importlib.import_module("inverted_index")
+InvertedIndex = _inverted.InvertedIndex
+
+
+def _synthetic_matrix(n_docs: int, n_terms: int, doc_len: int, rng: np.random.Generator) -> sparse.csr_matrix:
+    ranks = np.arange(1, n_terms + 1, dtype=np.float64)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    cols = rng.choice(n_terms, size=n_docs * doc_len, p=probs)
+    rows = np.repeat(np.arange(n_docs), doc_len)
+    matrix = sparse.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(n_docs, n_terms))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return sparse.csr_matrix(sparse.diags(1.0 / np.where(norms == 0, 1.0, norms)) @ matrix)
+
+
+def _full_scan(index: InvertedIndex, terms: np.ndarray, weights: np.ndarray, k: int):
+    acc = index.scores(terms, weights)
+    ids = np.flatnonzero(acc > 0)
+    if len(ids) > k:
+        ids = np.sort(ids[np.argpartition(-acc[ids], k - 1)[:k]])
+    return ids, acc[ids]
+
+
+def _time(fn, queries) -> float:
+    started = time.perf_counter()
+    for terms, weights in queries:
+        fn(terms, weights)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inverted-index top-k against the full scan.")
+    parser.add_argument("--docs", type=int, default=300000)
+    parser.add_argument("--terms", type=int, default=20000)
+    parser.add_argument("--doc-len", type=int, default=30, help="Tokens drawn per document")
+    parser.add_argument("--query-terms", type=int, default=10)
+    parser.add_argument("--k", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    index = InvertedIndex.from_tfidf(_synthetic_matrix(args.docs, args.terms, args.doc_len, rng))
+    print(f"[topk] built {args.docs} x {args.terms} index ({len(index.data)} postings) in {time.perf_counter() - started:.2f}s")
+    print(f"[topk] dense ratio threshold: {_inverted.INVERTED_DENSE_RATIO}")
+
+    bands = {
+        "common": (0, max(args.query_terms, args.terms // 100)),
+        "mixed": (0, args.terms),
+        "rare": (args.terms // 2, args.terms),
+    }
+    print(f"{'terms':>7} {'postings':>9} {'scan ms':>8} {'top_k ms':>9} {'speedup':>8} {'exact':>6}")
+    for name, (low, high) in bands.items():
+        queries = []
+        for _ in range(args.queries):
+            terms = rng.choice(np.arange(low, high), size=args.query_terms, replace=False)
+            weights = rng.random(args.query_terms)
+            queries.append((terms, weights / np.linalg.norm(weights)))
+        # Documents tied at the k-th score may be picked either way, so compare score lists.
+        exact = all(
+            np.allclose(np.sort(a[1]), np.sort(b[1]))
+            for a, b in (
+                (index.top_k(t, w, args.k), _full_scan(index, t, w, args.k)) for t, w in queries
+            )
+        )
+        postings = np.mean([np.diff(index.indptr)[t].sum() for t, _ in queries])
+        scan_ms = _time(lambda t, w: _full_scan(index, t, w, args.k), queries)
+        topk_ms = _time(lambda t, w: index.top_k(t, w, args.k), queries)
+        print(f"{name:>7} {postings:>9.0f} {scan_ms:>8.3f} {topk_ms:>9.3f} {scan_ms / topk_ms:>7.2f}x {str(exact):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Build the versioned recommender index artifact offline so workers can load it at boot.
+
+Usage:
+    python back/tools/build_recommender_index.py [--data-dir DIR] [--out back/model/artifacts/recommender_index] [--force]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from model.recommender import build_recommender_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the recommender index artifact.")
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Directory with part_*.jsonl files (default: RECOMMENDER_DATA_DIR or the bundled data dir)",
+    )
+    parser.add_argument(
+        "--out",
+        default=None,
+        help="Artifact root directory (default: RECOMMENDER_INDEX_DIR or back/model/artifacts/recommender_index)",
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the fingerprint still matches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger = logging.getLogger("build_recommender_index")
+    env = build_recommender_index(data_dir=args.data_dir, index_dir=args.out, force=args.force, logger=logger)
+    if not env.get("index_version"):
+        raise SystemExit("Index artifact could not be written.")
+    print(f"[index] {env['index_version']} ({len(env['catalog'])} products)")
+
+
+if __name__ == "__main__":
+    main()
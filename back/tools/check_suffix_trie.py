@@ -0,0 +1,78 @@
+"""
+Conformance check: the trie-based Korean suffix stripper must match the original
+linear scan over _KOREAN_PARTICLE_SUFFIXES / _KOREAN_VERB_SUFFIXES.
+
+Usage:
+    python back/tools/check_suffix_trie.py [--random 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import random
+import sys
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+
+text_utils = importlib.import_module("2_text_processing")
+
+
+def reference_strip(token: str, particles: Sequence[str], verbs: Sequence[str]) -> str:
+    """The original implementation: first list entry that matches, particles then verb endings."""
+    if not text_utils._KOREAN_ONLY.match(token):
+        return token
+    base = token
+    for suffix in particles:
+        if base.endswith(suffix) and len(base) > len(suffix):
+            base = base[: -len(suffix)]
+            break
+    for suffix in verbs:
+        if base.endswith(suffix) and len(base) > len(suffix):
+            base = base[: -len(suffix)]
+            break
+    return base
+
+
+def candidate_tokens(particles: Sequence[str], verbs: Sequence[str], n_random: int, seed: int) -> Iterable[str]:
+    stems = ["", "가", "선물", "하", "되", "들", "으", "에게", "향수", "abc"]
+    suffixes: List[str] = list(dict.fromkeys([*particles, *verbs]))
+    for stem in stems:
+        for suffix in suffixes:
+            yield stem + suffix
+            for verb in verbs:
+                yield stem + verb + suffix
+    rng = random.Random(seed)
+    alphabet = sorted({ch for suffix in suffixes for ch in suffix} | set("가나다선물"))
+    for _ in range(n_random):
+        yield "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the suffix trie against the linear reference.")
+    parser.add_argument("--random", type=int, default=200_000, help="Number of random Hangul tokens to add")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    particles = text_utils._KOREAN_PARTICLE_SUFFIXES
+    verbs = text_utils._KOREAN_VERB_SUFFIXES
+    checked = 0
+    mismatches = []
+    for token in candidate_tokens(particles, verbs, args.random, args.seed):
+        checked += 1
+        expected = reference_strip(token, particles, verbs)
+        actual = text_utils._strip_korean_suffix(token)
+        if expected != actual:
+            mismatches.append((token, expected, actual))
+    for token, expected, actual in mismatches[:20]:
+        print(f"[mismatch] {token!r}: reference={expected!r} trie={actual!r}")
+    print(f"[check] {checked} tokens, {len(mismatches)} mismatches")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
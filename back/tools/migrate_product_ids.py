@@ -0,0 +1,42 @@
+"""
+Write the mapping from legacy sequential product ids to stable content-hashed ids.
+
+Legacy ids were assigned 1..N in sorted part_*.jsonl order, so run this against the
+same catalog snapshot that issued them. The JSON output ({"<old_id>": "<new_id>"})
+can be used to rewrite product_ratings, product_rating_summary and favorites docs.
+
+Usage:
+    python back/tools/migrate_product_ids.py --out back/data/exports/product_id_map.json [--data-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+
+legacy_id_mapping = importlib.import_module("1_sample_data").legacy_id_mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export legacy → stable product id mapping.")
+    parser.add_argument("--data-dir", default=None, help="Directory with part_*.jsonl files")
+    parser.add_argument("--out", required=True, help="Path of the JSON mapping file to write")
+    args = parser.parse_args()
+
+    mapping = legacy_id_mapping(args.data_dir)
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", encoding="utf-8") as fp:
+        json.dump({str(old): new for old, new in mapping.items()}, fp, ensure_ascii=False)
+    shared = len(mapping) - len(set(mapping.values()))
+    print(f"[migrate] {len(mapping)} legacy ids → {out_path} ({shared} duplicates share a stable id)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Report memory savings and ranking agreement of quantized document embeddings.
+
+Builds the environment at full precision, then for float16 and per-row int8 storage
+compares, on a query set, (a) the semantic top-k by W2V cosine (an item counts as
+agreeing when its exact score reaches the exact k-th score, so ties do not count as
+misses) and (b) the final recommendation list of the whole pipeline against the
+float32 path.
+
+Usage:
+    python back/tools/report_embedding_quantization.py [--data-dir DIR] [--queries-file FILE] [--sample 200] [--k 12]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+# 비교 기준은 항상 float32 환경이다.
+os.environ["RECO_EMBEDDING_DTYPE"] = "float32"
+
+compress_embeddings = importlib.import_module("embedding_store").compress_embeddings
+_pipeline = importlib.import_module("7_pipeline")
+_modeling = importlib.import_module("3_modeling")
+_text_utils = importlib.import_module("2_text_processing")
+
+
+def _semantic_sims(query: str, vectors, embeddings) -> np.ndarray:
+    row = vectors["query_vectorizer"].transform(_text_utils.normalize_text(query))
+    query_vec = _modeling.tfidf_weighted_embedding(row, vectors["feature_vectors"], vectors["feature_in_vocab"])
+    return _modeling.cosine_sim_dense(query_vec, embeddings)
+
+
+def _top(sims: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(sims))
+    return np.argpartition(-sims, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+
+
+def _run(query, catalog, vectors, k):
+    # 파이프라인의 진행 로그는 보고서 출력에서 감춘다.
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, _ = _pipeline.run_query(query, catalog, vectors, False, k)
+    return results["product_id"].tolist() if not results.empty else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized embedding memory/agreement report.")
+    parser.add_argument("--data-dir", default=None, help="Directory with part_*.jsonl files")
+    parser.add_argument("--queries-file", default=None, help="Text file with one query per line")
+    parser.add_argument("--sample", type=int, default=200, help="Also use N random product titles as queries")
+    parser.add_argument("--k", type=int, default=12, help="Top-k used for agreement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        catalog, vectors = _pipeline.prepare_environment(args.data_dir)
+    full = vectors["doc_embeddings"]
+    if vectors["feature_vectors"] is None:
+        print("[quant] No Word2Vec artifact: embeddings are all zero, agreement is trivially 1.0.")
+
+    queries = list(_pipeline.SAMPLE_QUERIES)
+    if args.queries_file:
+        queries += [line.strip() for line in Path(args.queries_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+    rng = random.Random(args.seed)
+    queries += [catalog.title(idx) for idx in rng.sample(range(len(catalog)), min(args.sample, len(catalog)))]
+
+    baseline = [_run(query, catalog, vectors, args.k) for query in queries]
+    print(f"[quant] {len(catalog)} docs x {full.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'dtype':>8} {'MiB':>8} {'saving':>7} {'sem@k':>7} {'max|dsim|':>10} {'final@k':>8} {'same order':>11}")
+    print(f"{'float32':>8} {full.nbytes / 2**20:>8.2f} {1.0:>6.1f}x {1.0:>7.4f} {0.0:>10.2e} {1.0:>8.4f} {1.0:>11.4f}")
+    for dtype in ("float16", "int8"):
+        quantized = compress_embeddings(full, dtype)
+        variant = {**vectors, "doc_embeddings": quantized}
+        sem_overlap, max_err, final_overlap, same_order = [], 0.0, [], []
+        for query, expected in zip(queries, baseline):
+            exact = _semantic_sims(query, vectors, full)
+            approx = _semantic_sims(query, vectors, quantized)
+            max_err = max(max_err, float(np.abs(exact - approx).max()) if len(exact) else 0.0)
+            picked = _top(approx, args.k)
+            if len(picked):
+                # 동점이 많은 카탈로그에서도 공정하도록, 정확한 k번째 점수 이상인 항목을 일치로 센다.
+                kth = np.partition(exact, len(exact) - len(picked))[len(exact) - len(picked)]
+                sem_overlap.append(float(np.mean(exact[picked] >= kth - 1e-6)))
+            got = _run(query, catalog, variant, args.k)
+            if expected:
+                final_overlap.append(len(set(expected).intersection(got)) / len(expected))
+            same_order.append(float(got == expected))
+        print(
+            f"{dtype:>8} {quantized.nbytes / 2**20:>8.2f} {full.nbytes / quantized.nbytes:>6.1f}x "
+            f"{np.mean(sem_overlap or [1.0]):>7.4f} {max_err:>10.2e} "
+            f"{np.mean(final_overlap or [1.0]):>8.4f} {np.mean(same_order):>11.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,42 @@
 """
-Retrain Word2Vec embeddings using exported log data (search_logs, search_feedback, user_logs).
+Retrain Word2Vec embeddings using exported log data (search_logs, search_feedback, user_logs)
+and, optionally, the product catalog.
+
+Sentences are streamed from disk on every pass (vocabulary scan + each epoch), so memory
+stays bounded by the largest single input file, and training uses all cores by default.
+--update-from continues a previous model, adding new words to its vocabulary.
+The top-N neighbor table used for query expansion is a required output, written next to the
+saved model (the server only opens it). --neighbors-only builds it for an existing model.
 
 Usage example:
     python back/tools/retrain_word2vec.py --inputs back/data/exports/search_logs_*.jsonl --out back/model/artifacts
+    python back/tools/retrain_word2vec.py --inputs "back/data/exports/*.jsonl" --catalog --update-from latest
+    python back/tools/retrain_word2vec.py --neighbors-only latest
 """
 
 import argparse
 import glob
+import hashlib
+import importlib
 import json
 import re
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List, Set, Tuple
+from typing import Iterator, List, Sequence
 
 from gensim.models import Word2Vec
 
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "model" / "recommender"))
+
+_modeling = importlib.import_module("3_modeling")
+list_word2vec_artifacts = _modeling.list_word2vec_artifacts
+train_word2vec_streaming = _modeling.train_word2vec_streaming
+load_keyed_vectors = _modeling.load_keyed_vectors
+build_neighbor_table = importlib.import_module("neighbor_table").build_neighbor_table
+CatalogSentences = importlib.import_module("7_pipeline").CatalogSentences
+
 TOKEN_RE = re.compile(r"[가-힣A-Za-z0-9]+")
 
 DEFAULT_KEYS = [
@@ -41,13 +63,21 @@ def extract_from_dict(data: dict, key_path: str) -> str:
     return current if isinstance(current, str) else ""
 
 
-def load_corpus(paths: Iterable[str], min_length: int = 2) -> Tuple[List[List[str]], List[str]]:
-    corpus: List[List[str]] = []
-    seen: Set[str] = set()
-    matched_files: Set[str] = set()
-    for pattern in paths:
-        for filename in glob.glob(pattern):
-            matched_files.add(filename)
+class LogSentences:
+    """
+    Restartable corpus over exported JSONL logs: each iteration re-reads the files.
+
+    Duplicate sentences are skipped within a file; the seen set is reset per file so
+    memory does not grow with the total log volume.
+    """
+
+    def __init__(self, patterns: Sequence[str], min_length: int = 2):
+        self.min_length = min_length
+        self.paths = sorted({filename for pattern in patterns for filename in glob.glob(pattern)})
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for filename in self.paths:
+            seen = set()
             with open(filename, "r", encoding="utf-8") as fp:
                 for line in fp:
                     line = line.strip()
@@ -57,55 +87,123 @@ def load_corpus(paths: Iterable[str], min_length: int = 2) -> Tuple[List[List[st
                         data = json.loads(line)
                     except json.JSONDecodeError:
                         continue
-                    text_candidates = []
                     for key in DEFAULT_KEYS:
-                        value = extract_from_dict(data, key)
-                        if value:
-                            text_candidates.append(value)
-                    for text in text_candidates:
-                        fingerprint = f"{filename}:{hash(text)}"
+                        text = extract_from_dict(data, key)
+                        if not text:
+                            continue
+                        fingerprint = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
                         if fingerprint in seen:
                             continue
                         seen.add(fingerprint)
                         tokens = tokenize(text)
-                        if len(tokens) >= min_length:
-                            corpus.append(tokens)
-    return corpus, sorted(matched_files)
+                        if len(tokens) >= self.min_length:
+                            yield tokens
+
+
+class ChainedSentences:
+    """Concatenate several restartable corpora into one."""
+
+    def __init__(self, corpora):
+        self.corpora = list(corpora)
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for corpus in self.corpora:
+            yield from corpus
+
+
+def _resolve_previous(value: str, out_dir: Path) -> Path:
+    if value != "latest":
+        return Path(value)
+    artifacts = list_word2vec_artifacts(out_dir)
+    if not artifacts:
+        raise SystemExit(f"No previous word2vec_logs_*.model found in {out_dir}.")
+    return artifacts[0]
+
+
+def _save_neighbor_table(model_path: Path, wv):
+    if len(wv) < 2:
+        print(f"[retrain] Skipped neighbor table: vocabulary of {model_path} has {len(wv)} word(s)")
+        return
+    try:
+        table = build_neighbor_table(model_path, wv)
+    except OSError as exc:
+        raise SystemExit(f"Failed to save the neighbor table next to {model_path}: {exc}")
+    print(f"[retrain] Saved neighbor table ({len(table)} words × {table.width}) next to {model_path}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Retrain Word2Vec from exported logs.")
     parser.add_argument(
         "--inputs",
-        nargs="+",
-        required=True,
+        nargs="*",
+        default=[],
         help="Glob patterns for JSONL files (e.g., back/data/exports/search_logs_*.jsonl)",
     )
+    parser.add_argument("--catalog", action="store_true", help="Also train on product catalog sentences")
+    parser.add_argument("--data-dir", default=None, help="Catalog part_*.jsonl directory (with --catalog)")
     parser.add_argument(
         "--out",
         default=str(Path("back") / "model" / "artifacts"),
         help="Directory to store trained models",
     )
+    parser.add_argument(
+        "--update-from",
+        default=None,
+        help="Continue training a previous full model (path, or 'latest' in --out) with vocabulary update",
+    )
+    parser.add_argument(
+        "--neighbors-only",
+        default=None,
+        help="Only build the neighbor table for an existing model (path, or 'latest' in --out)",
+    )
     parser.add_argument("--vector-size", type=int, default=100)
     parser.add_argument("--window", type=int, default=5)
     parser.add_argument("--min-count", type=int, default=1)
     parser.add_argument("--sg", type=int, default=1, choices=[0, 1], help="Word2Vec training algorithm (0=CBOW,1=SG)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=0, help="Worker threads (0 = all cores)")
     args = parser.parse_args()
 
-    corpus, source_files = load_corpus(args.inputs)
-    if not source_files:
-        raise SystemExit("No input files matched the provided patterns.")
-    if not corpus:
-        raise SystemExit("Corpus is empty. Provide valid export files.")
-
-    print(f"[retrain] Loaded {len(corpus)} sentences for training.")
-    model = Word2Vec(
-        sentences=corpus,
+    if args.neighbors_only:
+        model_path = _resolve_previous(args.neighbors_only, Path(args.out))
+        _save_neighbor_table(model_path, load_keyed_vectors(model_path))
+        return
+
+    corpora = []
+    source_files: List[str] = []
+    if args.inputs:
+        logs = LogSentences(args.inputs)
+        if not logs.paths:
+            raise SystemExit("No input files matched the provided patterns.")
+        corpora.append(logs)
+        source_files.extend(logs.paths)
+    if args.catalog:
+        catalog = CatalogSentences(args.data_dir)
+        corpora.append(catalog)
+        source_files.extend(str(path) for path in catalog.files())
+    if not corpora:
+        raise SystemExit("Nothing to train on: pass --inputs and/or --catalog.")
+    sentences = ChainedSentences(corpora)
+
+    previous = None
+    if args.update_from:
+        previous_path = _resolve_previous(args.update_from, Path(args.out))
+        previous = Word2Vec.load(str(previous_path))
+        print(f"[retrain] Continuing {previous_path} ({len(previous.wv)} words)")
+
+    model = train_word2vec_streaming(
+        sentences,
+        previous,
         vector_size=args.vector_size,
         window=args.window,
         min_count=args.min_count,
         sg=args.sg,
+        epochs=args.epochs,
+        workers=args.workers or None,
     )
+    if not model.corpus_count:
+        raise SystemExit("Corpus is empty. Provide valid export files.")
+    print(f"[retrain] Trained on {model.corpus_count} sentences, vocabulary {len(model.wv)} words.")
 
     out_dir = Path(args.out)
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -124,6 +222,7 @@ def main():
     model_path = out_dir / f"word2vec_logs_{timestamp}.model"
     model.save(str(model_path))
     print(f"[retrain] Saved Word2Vec model → {model_path}")
+    _save_neighbor_table(model_path, model.wv)
 
 
 if __name__ == "__main__":